@@ -0,0 +1,324 @@
+""" Benchmarks of the generation, loading, storing and plotting hot paths
+
+Runs offline: the planner of the map is a SyntheticPlanner on a generated grid graph
+
+Example:
+    python3 benchmarks/run_benchmarks.py --sizes 10,100,1000 --output results.json --compare previous.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from dataset_lib.config.creators import TaskCreator, creator_registry
+from dataset_lib.config.factories import DatasetMeta, Interval, OverlappingTW, add_constraints, get_tasks_set
+from dataset_lib.load_dataset import load_yaml_dataset
+from dataset_lib.utils.datasets import store_as_yaml, store_as_csv
+from synthetic_planner import SyntheticPlanner
+
+MAP_NAME = 'synthetic'
+INITIAL_TIME = "2020-01-23T08:00:00.000000"
+
+
+class BenchmarkContext:
+    """ Creators of the synthetic map and datasets shared by the benchmarks
+    """
+
+    def __init__(self, width, duration_range, n_overlapping_sets, seed=0):
+        self.planner = SyntheticPlanner(width)
+        creator_registry.register_planner(MAP_NAME, self.planner)
+        self.pose_creator = creator_registry.get_pose_creator(MAP_NAME, use_duration_matrix=False, seed=seed)
+        self.task_creator = TaskCreator('task')
+        self.map_sections = sorted(self.planner.map_graph.graph['goals'])
+        # Poses of a set of tasks are taken from one map section, as in OverlappingTW
+        self.set_map_sections = self.map_sections[:1]
+        self.duration_range = duration_range
+        self.n_overlapping_sets = n_overlapping_sets
+        self.seed = seed
+        self.directory = tempfile.mkdtemp(prefix='mrta_benchmarks_')
+        self._datasets = dict()
+
+    def warm_up(self):
+        """ Plans the paths between all goal poses of each section, so that the benchmarks measure the sampling
+        and not the synthetic planner
+        """
+        for section in self.map_sections:
+            poses = self.pose_creator.get_available_poses([section])
+            for pose in poses:
+                self.pose_creator.delivery_sampler.get_sorted_deliveries((section,), poses, pose)
+                for delivery_pose in poses:
+                    self.pose_creator.get_plan(pose, delivery_pose)
+
+    def get_rng(self):
+        return np.random.default_rng(self.seed)
+
+    def get_dataset_meta(self, dataset_name):
+        return DatasetMeta(dataset_name, 'overlapping', 2700, Interval('random', 30, 60),
+                           Interval('random', 30, 120), self.map_sections)
+
+    def get_dataset(self, n_tasks):
+        """ Returns a dataset of n_tasks tasks, created once per size
+        """
+        dataset = self._datasets.get(n_tasks)
+        if dataset is None:
+            dataset_creator = OverlappingTW(self.task_creator, self.pose_creator,
+                                            self.get_dataset_meta('benchmark_%s' % n_tasks), seed=self.seed)
+            dataset, _ = dataset_creator.create(n_tasks, self.n_overlapping_sets,
+                                                duration_range=self.duration_range)
+            self._datasets[n_tasks] = dataset
+        return dataset
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        creator_registry.release(MAP_NAME)
+
+
+# Each benchmark receives the context and the number of tasks and returns the function to time
+
+def bench_get_poses(context, n_tasks):
+    def run():
+        rng = context.get_rng()
+        for _ in range(n_tasks):
+            context.pose_creator.get_poses(context.set_map_sections, rng=rng)
+    return run
+
+
+def bench_get_poses_duration_range(context, n_tasks):
+    def run():
+        rng = context.get_rng()
+        for _ in range(n_tasks):
+            context.pose_creator.get_poses(context.set_map_sections, context.duration_range, rng)
+    return run
+
+
+def bench_get_tasks_set(context, n_tasks):
+    def run():
+        get_tasks_set(context.task_creator, context.pose_creator, context.duration_range, n_tasks,
+                      context.set_map_sections, rng=context.get_rng())
+    return run
+
+
+def bench_add_constraints(context, n_tasks):
+    tasks = get_tasks_set(context.task_creator, context.pose_creator, context.duration_range, n_tasks,
+                          context.set_map_sections, rng=context.get_rng())
+    dataset_meta = context.get_dataset_meta('add_constraints')
+
+    def run():
+        add_constraints(tasks, dataset_meta.pickup_time_interval, dataset_meta.time_window_interval,
+                        dataset_meta.start_time, context.pose_creator, rng=context.get_rng())
+    return run
+
+
+def bench_overlapping_create(context, n_tasks):
+    dataset_meta = context.get_dataset_meta('overlapping_create')
+
+    def run():
+        OverlappingTW(context.task_creator, context.pose_creator, dataset_meta,
+                      seed=context.seed).create(n_tasks, context.n_overlapping_sets,
+                                                duration_range=context.duration_range)
+    return run
+
+
+def bench_store_as_yaml(context, n_tasks):
+    dataset = context.get_dataset(n_tasks)
+    dataset_file = os.path.join(context.directory, 'store_as_yaml_%s.yaml' % n_tasks)
+
+    def run():
+        store_as_yaml(dataset, dataset_file)
+    return run
+
+
+def bench_store_as_csv(context, n_tasks):
+    dataset = context.get_dataset(n_tasks)
+    # store_as_csv takes a path relative to the current directory
+    path = '/' + os.path.relpath(os.path.join(context.directory, 'csv'), os.getcwd()) + '/'
+
+    def run():
+        store_as_csv(dataset, context.task_creator.task_cls, path)
+    return run
+
+
+def _store_dataset(context, n_tasks):
+    dataset_name = 'load_%s' % n_tasks
+    if not os.path.exists(os.path.join(context.directory, dataset_name + '.yaml')):
+        store_as_yaml(context.get_dataset(n_tasks), os.path.join(context.directory, dataset_name + '.yaml'))
+    return dataset_name
+
+
+def bench_load_yaml_dataset(context, n_tasks):
+    dataset_name = _store_dataset(context, n_tasks)
+
+    def run():
+        load_yaml_dataset(dataset_name, 'task', cache=False, datasets_dir=context.directory + '/')
+    return run
+
+
+def bench_load_yaml_dataset_cached(context, n_tasks):
+    dataset_name = _store_dataset(context, n_tasks)
+    # Fills the cache
+    load_yaml_dataset(dataset_name, 'task', datasets_dir=context.directory + '/')
+
+    def run():
+        load_yaml_dataset(dataset_name, 'task', datasets_dir=context.directory + '/')
+    return run
+
+
+def bench_plot_dataset_plotly(context, n_tasks):
+    # Imported here because plotly is only needed by this benchmark
+    from dataset_lib.plot_dataset import plot_dataset_plotly
+    dataset_name = _store_dataset(context, n_tasks)
+    dataset = load_yaml_dataset(dataset_name, 'task', datasets_dir=context.directory + '/')
+
+    def run():
+        plot_dataset_plotly(dataset_name, dataset, INITIAL_TIME, dir=os.path.join(context.directory, 'plots'),
+                            write_image=False, include_plotlyjs='directory')
+    return run
+
+
+BENCHMARKS = {'get_poses': bench_get_poses,
+              'get_poses_duration_range': bench_get_poses_duration_range,
+              'get_tasks_set': bench_get_tasks_set,
+              'add_constraints': bench_add_constraints,
+              'overlapping_create': bench_overlapping_create,
+              'store_as_yaml': bench_store_as_yaml,
+              'store_as_csv': bench_store_as_csv,
+              'load_yaml_dataset': bench_load_yaml_dataset,
+              'load_yaml_dataset_cached': bench_load_yaml_dataset_cached,
+              'plot_dataset_plotly': bench_plot_dataset_plotly}
+
+
+def measure(run, repeat, memory=True):
+    """ Returns the wall times of repeat calls to run and the peak memory (bytes) allocated during one more call
+    The memory is measured separately because tracemalloc slows down the calls
+    """
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    peak_memory = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return times, peak_memory
+
+
+def run_benchmarks(context, names, sizes, repeat=3, memory=True):
+    """ Runs each benchmark in names for each number of tasks in sizes
+
+    :return: list of results (dicts)
+    """
+    results = list()
+    for name in names:
+        for n_tasks in sizes:
+            result = {'benchmark': name, 'n_tasks': n_tasks}
+            try:
+                run = BENCHMARKS[name](context, n_tasks)
+            except ImportError as error:
+                result['skipped'] = str(error)
+                print("%-26s %8s skipped: %s" % (name, n_tasks, error))
+                results.append(result)
+                break
+            times, peak_memory = measure(run, repeat, memory)
+            result.update(time=min(times), times=times, peak_memory=peak_memory)
+            print("%-26s %8s %10.4f s %12s" % (name, n_tasks, min(times),
+                                               '-' if peak_memory is None else '%.1f MB' % (peak_memory / 1e6)))
+            results.append(result)
+    return results
+
+
+def compare(results, previous_results):
+    """ Prints the time and peak memory of each result relative to the same benchmark and size in previous_results
+    """
+    previous = {(result['benchmark'], result['n_tasks']): result for result in previous_results
+                if 'time' in result}
+    print("%-26s %8s %10s %10s" % ('benchmark', 'n_tasks', 'time', 'memory'))
+    for result in results:
+        previous_result = previous.get((result['benchmark'], result['n_tasks']))
+        if 'time' not in result or previous_result is None:
+            continue
+        time_ratio = result['time'] / previous_result['time'] if previous_result['time'] else float('nan')
+        memory_ratio = '-'
+        if result['peak_memory'] and previous_result.get('peak_memory'):
+            memory_ratio = '%.2fx' % (result['peak_memory'] / previous_result['peak_memory'])
+        print("%-26s %8s %9.2fx %10s" % (result['benchmark'], result['n_tasks'], time_ratio, memory_ratio))
+
+
+def parse_sizes(sizes_str):
+    return [int(size) for size in sizes_str.split(',')]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--sizes', type=parse_sizes, help='Numbers of tasks, e.g. 10,100,1000',
+                        default=[10, 100, 1000, 10000, 100000])
+
+    parser.add_argument('--benchmarks', type=str, nargs='+', choices=list(BENCHMARKS),
+                        help='Benchmarks to run. Default: all', default=list(BENCHMARKS))
+
+    parser.add_argument('--grid_width', type=int, help='The synthetic map is a grid_width x grid_width grid',
+                        default=20)
+
+    parser.add_argument('--min_duration', type=int, help='Minimum duration (seconds) between pickup and delivery',
+                        default=10)
+
+    parser.add_argument('--max_duration', type=int, help='Maximum duration (seconds) between pickup and delivery',
+                        default=120)
+
+    parser.add_argument('--n_overlapping_sets', type=int, default=5)
+
+    parser.add_argument('--repeat', type=int, help='Number of timed runs, the minimum is reported', default=3)
+
+    parser.add_argument('--no_memory', action='store_true', help='Do not measure the peak memory')
+
+    parser.add_argument('--seed', type=int, default=0)
+
+    parser.add_argument('--output', type=str, help='Json file with the results', default='benchmark_results.json')
+
+    parser.add_argument('--compare', type=str, help='Json file with the results of an earlier run', default=None)
+
+    args = parser.parse_args()
+
+    context = BenchmarkContext(args.grid_width, [args.min_duration, args.max_duration], args.n_overlapping_sets,
+                               args.seed)
+    try:
+        start_time = time.perf_counter()
+        context.warm_up()
+        print("Warm up: %.2f s" % (time.perf_counter() - start_time))
+        results = run_benchmarks(context, args.benchmarks, args.sizes, args.repeat, not args.no_memory)
+    finally:
+        context.close()
+
+    report = {'date': datetime.datetime.now().isoformat(),
+              'python': sys.version.split()[0],
+              'numpy': np.__version__,
+              'platform': platform.platform(),
+              'config': {'grid_width': args.grid_width,
+                         'duration_range': [args.min_duration, args.max_duration],
+                         'n_overlapping_sets': args.n_overlapping_sets,
+                         'repeat': args.repeat,
+                         'seed': args.seed},
+              'results': results}
+
+    with open(args.output, 'w') as outfile:
+        json.dump(report, outfile, indent=2)
+    print("Results: ", args.output)
+
+    if args.compare:
+        with open(args.compare) as infile:
+            compare(results, json.load(infile)['results'])
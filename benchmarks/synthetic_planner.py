@@ -0,0 +1,90 @@
+""" Stand-in for planner.planner.Planner built from a generated graph, so that the benchmarks run without the
+planner package and its maps
+"""
+
+import heapq
+
+import numpy as np
+
+
+class SyntheticMapGraph:
+    """ Grid graph with width x width nodes named N00000, N00001, ...
+
+    Each edge has a duration mean and variance. The rows of the grid are split into n_sections map sections
+    and every other node of a section is a goal pose of the section
+    """
+
+    def __init__(self, width, n_sections=3, seed=0):
+        rng = np.random.default_rng(seed)
+        n_nodes = width * width
+        self._nodes = ['N%05d' % i for i in range(n_nodes)]
+        self.adjacency = {node: dict() for node in self._nodes}
+
+        for i in range(n_nodes):
+            row, column = divmod(i, width)
+            neighbours = list()
+            if column + 1 < width:
+                neighbours.append(i + 1)
+            if row + 1 < width:
+                neighbours.append(i + width)
+            for j in neighbours:
+                mean = float(rng.uniform(2, 9))
+                data = {'mean': mean, 'variance': mean / 10}
+                self.adjacency[self._nodes[i]][self._nodes[j]] = data
+                self.adjacency[self._nodes[j]][self._nodes[i]] = data
+
+        sections = ['section_%s' % k for k in range(n_sections)]
+        rows_per_section = max(width // n_sections, 1)
+        goals = {section: list() for section in sections}
+        for i in range(0, n_nodes, 2):
+            section = sections[min(i // width // rows_per_section, n_sections - 1)]
+            goals[section].append(self._nodes[i])
+        self.graph = {'goals': goals}
+
+    def nodes(self):
+        return list(self._nodes)
+
+    def edges(self, data=False):
+        for u, neighbours in self.adjacency.items():
+            for v, edge_data in neighbours.items():
+                if u < v:
+                    yield (u, v, edge_data) if data else (u, v)
+
+
+class SyntheticPlanner:
+    """ Planner with the API used by PoseCreator: map_graph, get_path and get_estimated_duration
+    Paths are the shortest paths by mean duration (Dijkstra)
+    """
+
+    def __init__(self, width=30, n_sections=3, seed=0):
+        self.map_graph = SyntheticMapGraph(width, n_sections, seed)
+
+    def get_path(self, source, target):
+        adjacency = self.map_graph.adjacency
+        distances = {source: 0}
+        previous = dict()
+        queue = [(0, source)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if node == target:
+                break
+            if distance > distances[node]:
+                continue
+            for neighbour, data in adjacency[node].items():
+                new_distance = distance + data['mean']
+                if new_distance < distances.get(neighbour, float('inf')):
+                    distances[neighbour] = new_distance
+                    previous[neighbour] = node
+                    heapq.heappush(queue, (new_distance, neighbour))
+
+        path = [target]
+        while path[-1] != source:
+            path.append(previous[path[-1]])
+        return path[::-1]
+
+    def get_estimated_duration(self, path):
+        """ Returns the mean and variance of the duration of the path
+        """
+        adjacency = self.map_graph.adjacency
+        edges = [adjacency[u][v] for u, v in zip(path, path[1:])]
+        return sum(edge['mean'] for edge in edges), sum(edge['variance'] for edge in edges)
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+
+from dataset_lib.config.task_table import TaskTable
+from dataset_lib.load_dataset import get_datasets_dir
+from dataset_lib.utils.catalog import Catalog, TasksSummary, get_catalog_path
+from dataset_lib.utils.datasets import load_yaml_cached, load_npz, load_jsonl_metadata, iter_jsonl, is_dataset
+
+
+def index_datasets(datasets_dir):
+    """ Rebuilds the catalog of datasets_dir from the .yaml, .npz and .jsonl datasets in the directory
+
+    :param datasets_dir: directory of the datasets
+    :return: number of datasets recorded
+    """
+    catalog_path = get_catalog_path(os.path.join(datasets_dir, 'dataset'))
+    n_datasets = 0
+
+    with Catalog(catalog_path) as catalog:
+        for entry in catalog.query():
+            catalog.remove(entry['file_path'])
+
+        for file_ in sorted(os.listdir(datasets_dir)):
+            dataset_file = os.path.join(datasets_dir, file_)
+            summary = None
+
+            if file_.endswith('.yaml'):
+                dataset = load_yaml_cached(dataset_file)
+                file_format = 'yaml'
+            elif file_.endswith('.npz'):
+                columns = load_npz(dataset_file)
+                dataset = json.loads(str(columns['metadata']))
+                dataset['tasks'] = TaskTable.from_columns(columns)
+                file_format = 'npz'
+            elif file_.endswith('.jsonl'):
+                dataset = load_jsonl_metadata(dataset_file)
+                dataset['tasks'] = None
+                summary = TasksSummary()
+                for task in iter_jsonl(dataset_file):
+                    summary.add(task)
+                summary = summary.to_dict()
+                file_format = 'jsonl'
+            else:
+                continue
+
+            # Skip yaml files that are not datasets, e.g., shared node tables
+            if not is_dataset(dataset):
+                continue
+
+            catalog.record(dataset, dataset_file, file_format, summary)
+            n_datasets += 1
+
+    return n_datasets
+
+
+def query_datasets(datasets_dir, **kwargs):
+    """ Returns the catalog entries of datasets_dir that match the filters in kwargs (see Catalog.query)
+    """
+    with Catalog(get_catalog_path(os.path.join(datasets_dir, 'dataset'))) as catalog:
+        return catalog.query(**kwargs)
+
+
+if __name__ == '__main__':
+
+    "Indexes and queries the catalog of datasets"
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--datasets_dir', type=str, help='Directory of the datasets', default=get_datasets_dir())
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('index', help='Rebuilds the catalog from the dataset files')
+
+    query_parser = subparsers.add_parser('query', help='Prints the datasets that match all the given filters')
+
+    query_parser.add_argument('--dataset_type', type=str, choices=['overlapping', 'nonoverlapping'], default=None)
+
+    query_parser.add_argument('--interval_type', type=str, help='Time window interval type',
+                              choices=['tight', 'loose', 'random'], default=None)
+
+    query_parser.add_argument('--pickup_interval_type', type=str, choices=['tight', 'loose', 'random'],
+                              default=None)
+
+    query_parser.add_argument('--min_tasks', type=int, default=None)
+
+    query_parser.add_argument('--max_tasks', type=int, default=None)
+
+    query_parser.add_argument('--n_sets', type=int, default=None)
+
+    query_parser.add_argument('--map_section', type=str, default=None)
+
+    query_parser.add_argument('--file_format', type=str, choices=['yaml', 'npz', 'jsonl'], default=None)
+
+    query_parser.add_argument('--paths', action='store_true', help='Print the paths of the dataset files')
+
+    args = parser.parse_args()
+
+    if args.command == 'index':
+        print("Datasets: ", index_datasets(args.datasets_dir))
+
+    else:
+        entries = query_datasets(args.datasets_dir,
+                                 dataset_type=args.dataset_type,
+                                 time_window_interval_type=args.interval_type,
+                                 pickup_interval_type=args.pickup_interval_type,
+                                 min_tasks=args.min_tasks,
+                                 max_tasks=args.max_tasks,
+                                 n_sets=args.n_sets,
+                                 map_section=args.map_section,
+                                 file_format=args.file_format)
+        for entry in entries:
+            if args.paths:
+                print(entry['file_path'])
+            else:
+                print("%s (%s): %s tasks, %s sets, %s - %s" %
+                      (entry['dataset_name'], entry['file_format'], entry['n_tasks'], entry['n_sets'],
+                       entry['start_time'], entry['end_time']))
@@ -1,75 +1,317 @@
-import random
+import bisect
+import time
 
+import numpy as np
+from dataset_lib.config.duration_matrix import load_duration_matrix
 from dataset_lib.config.factories import dataset_factory
 from dataset_lib.config.factories import task_factory
-from planner.planner import Planner
+from dataset_lib.config.planners import planner_factory
+from dataset_lib.utils.cache import LRUCache
+from dataset_lib.utils.stats import stats
 
 
 class TaskCreator:
 
     def __init__(self, task_type):
+        self.task_type = task_type
         self.task_cls = task_factory.get_task_cls(task_type)
 
     def create(self, **kwargs):
         return self.task_cls(**kwargs)
 
 
+class DeliverySampler:
+    """ Samples delivery poses whose estimated duration from a pickup pose lies within a duration range
+
+    For each (candidate poses, pickup pose) it keeps the reachable delivery poses sorted by estimated duration,
+    so that the feasible deliveries for a duration range form a contiguous slice found by binary search
+    """
+
+    def __init__(self, get_estimated_duration):
+        self.get_estimated_duration = get_estimated_duration
+        self._deliveries = dict()
+
+    def get_sorted_deliveries(self, candidates_key, candidate_poses, pickup_pose):
+        """ Returns (durations, delivery_poses) from pickup_pose to every other candidate pose,
+        sorted by duration
+
+        :param candidates_key: hashable that identifies candidate_poses, e.g., the map sections
+        :param candidate_poses: tuple of poses
+        :param pickup_pose: pose in candidate_poses
+        """
+        key = (candidates_key, pickup_pose)
+        sorted_deliveries = self._deliveries.get(key)
+        if sorted_deliveries is None:
+            stats.count('delivery_sampler.sorted_deliveries')
+            deliveries = sorted((self.get_estimated_duration(pickup_pose, pose), i)
+                                for i, pose in enumerate(candidate_poses) if pose != pickup_pose)
+            durations = [duration for duration, _ in deliveries]
+            delivery_poses = [candidate_poses[i] for _, i in deliveries]
+            sorted_deliveries = (durations, delivery_poses)
+            self._deliveries[key] = sorted_deliveries
+        return sorted_deliveries
+
+    def sample(self, candidates_key, candidate_poses, pickup_pose, duration_range, rng):
+        """ Returns a delivery pose drawn uniformly (using the numpy Generator rng) from the candidate poses whose
+        estimated duration from pickup_pose is within [min(duration_range), max(duration_range)]
+
+        Raises ValueError if no candidate pose is within the duration range
+        """
+        durations, delivery_poses = self.get_sorted_deliveries(candidates_key, candidate_poses, pickup_pose)
+        start = bisect.bisect_left(durations, min(duration_range))
+        stop = bisect.bisect_right(durations, max(duration_range))
+        stats.count('delivery_sampler.samples')
+        if start >= stop:
+            stats.count('delivery_sampler.empty_ranges')
+            raise ValueError("No delivery pose within duration range [%s, %s] from pickup pose %s" %
+                             (min(duration_range), max(duration_range), pickup_pose))
+        return delivery_poses[rng.integers(start, stop)]
+
+
 class PoseCreator:
 
-    def __init__(self, map_name):
-        self.planner = Planner(map_name)
+    def __init__(self, map_name, cache_size=100000, **kwargs):
+        """ cache_size (int): Maximum number of (pickup, delivery) plans to memoize.
+        If None, the cache is unbounded
 
-    def get_poses(self, map_sections, duration_range=None):
+        If a DurationMatrix of the map has been precomputed (see precompute_durations.py), durations and paths
+        between goal poses are read from it instead of being planned
+
+        Poses are sampled with the numpy Generator passed to get_poses or, if none is passed,
+        with a Generator seeded with kwargs['seed']
+
+        The planner of the map is taken from the creator_registry, so all pose creators of a map share it.
+        kwargs['planner_backend'] selects the planner backend (see planners.planner_factory) if the map has
+        no planner yet
+        """
+        self.map_name = map_name
+        self.config = dict(kwargs, cache_size=cache_size)
+        self.rng = np.random.default_rng(kwargs.get('seed'))
+        self.planner = creator_registry.get_planner(map_name, kwargs.get('planner_backend'))
+        self.plan_cache = LRUCache(cache_size)
+        stats.register_cache('plan_cache.%s' % map_name, self.plan_cache)
+        if kwargs.get('use_duration_matrix', True):
+            self.duration_matrix = load_duration_matrix(map_name, self.planner.map_graph,
+                                                        kwargs.get('duration_matrix_dir'))
+        else:
+            self.duration_matrix = None
+        self.delivery_sampler = DeliverySampler(self.get_estimated_duration)
+
+        # Goal poses per section, in the order of the map graph nodes
+        self._node_order = {pose: i for i, pose in enumerate(self.planner.map_graph.nodes())}
+        self.section_poses = {section: self._sort_poses(poses)
+                              for section, poses in self.planner.map_graph.graph['goals'].items()}
+        self._available_poses = dict()
+
+    def get_poses(self, map_sections, duration_range=None, rng=None):
         """ Returns a pickup and a delivery pose within the given map_sections
-        duration_range = [min, max] seconds between the pickup and delivery pose
+        duration_range = [min, max] seconds between the pickup and delivery pose (both inclusive)
         if None, the duration is unbounded
+        The delivery pose is drawn uniformly from the poses within the duration range
+        rng: numpy Generator used to draw the poses
         """
-        goals = list()
-        for section in map_sections:
-            for pose in self.planner.map_graph.graph['goals'][section]:
-                goals.append(pose)
-
-        available_poses = [pose for pose in list(self.planner.map_graph.nodes())
-                           if pose in goals]
-        pickup_pose = random.choice(available_poses)
-        available_poses.remove(pickup_pose)
+        rng = self.rng if rng is None else rng
+        stats.count('get_poses')
+        available_poses = self.get_available_poses(map_sections)
+        pickup_index = rng.integers(len(available_poses))
+        pickup_pose = available_poses[pickup_index]
 
         if not duration_range:
-            # Unbounded duration
-            delivery_pose = random.choice(available_poses)
+            # Unbounded duration, any pose but the pickup pose
+            delivery_index = rng.integers(len(available_poses) - 1)
+            if delivery_index >= pickup_index:
+                delivery_index += 1
+            delivery_pose = available_poses[delivery_index]
 
         else:
-            estimated_duration = None
-            while estimated_duration not in duration_range:
-                delivery_pose = random.choice(available_poses)
-                estimated_duration = self.get_estimated_duration(pickup_pose, delivery_pose)
+            delivery_pose = self.delivery_sampler.sample(tuple(map_sections), available_poses, pickup_pose,
+                                                         duration_range, rng)
 
         return pickup_pose, delivery_pose
 
+    def _sort_poses(self, poses):
+        return tuple(sorted({pose for pose in poses if pose in self._node_order}, key=self._node_order.get))
+
+    def get_available_poses(self, map_sections):
+        """ Returns a tuple with the goal poses of the given map_sections
+        The tuple is built once per combination of map sections
+        """
+        key = tuple(map_sections)
+        available_poses = self._available_poses.get(key)
+        if available_poses is None:
+            if len(key) == 1:
+                available_poses = self.section_poses[key[0]]
+            else:
+                available_poses = self._sort_poses(pose for section in key for pose in self.section_poses[section])
+            self._available_poses[key] = available_poses
+        return available_poses
+
+    def _get_cached_plan(self, pickup_pose, delivery_pose):
+        """ Returns the (path, estimated_duration) between pickup_pose and delivery_pose.
+        Each pair of poses is planned at most once while it stays in the cache
+        """
+        key = (self.map_name, pickup_pose, delivery_pose)
+        cached_plan = self.plan_cache.get(key)
+        if cached_plan is None:
+            stats.count('planner.calls')
+            start_time = time.perf_counter()
+            path = self.planner.get_path(pickup_pose, delivery_pose)
+            mean, variance = self.planner.get_estimated_duration(path)
+            stats.add_time('planner', time.perf_counter() - start_time)
+            # Round to seconds
+            estimated_duration = round(mean + 2*(variance**0.5))
+            cached_plan = (tuple(path), estimated_duration)
+            self.plan_cache.put(key, cached_plan)
+        return cached_plan
+
+    def _in_duration_matrix(self, pickup_pose, delivery_pose):
+        if self.duration_matrix is not None and (pickup_pose, delivery_pose) in self.duration_matrix:
+            stats.count('duration_matrix.hits')
+            return True
+        return False
+
     def get_path(self, pickup_pose, delivery_pose):
-        return self.planner.get_path(pickup_pose, delivery_pose)
+        if self._in_duration_matrix(pickup_pose, delivery_pose):
+            return self.duration_matrix.get_path(pickup_pose, delivery_pose)
+        path, _ = self._get_cached_plan(pickup_pose, delivery_pose)
+        # Tasks must not share the same path object
+        return list(path)
 
     def get_estimated_duration(self, pickup_pose, delivery_pose):
-        path = self.get_path(pickup_pose, delivery_pose)
-        mean, variance = self.planner.get_estimated_duration(path)
-        # Round to seconds
-        estimated_duration = round(mean + 2*(variance**0.5))
+        if self._in_duration_matrix(pickup_pose, delivery_pose):
+            return self.duration_matrix.get_estimated_duration(pickup_pose, delivery_pose)
+        _, estimated_duration = self._get_cached_plan(pickup_pose, delivery_pose)
         return estimated_duration
 
+    def get_estimated_durations(self, pickup_poses, delivery_poses):
+        """ Returns an array with the estimated duration from each pickup pose to the delivery pose at the
+        same position
+        """
+        if self.duration_matrix is not None and all((pickup_pose, delivery_pose) in self.duration_matrix
+                                                    for pickup_pose, delivery_pose in zip(pickup_poses,
+                                                                                          delivery_poses)):
+            stats.count('duration_matrix.hits', len(pickup_poses))
+            return self.duration_matrix.get_estimated_durations(pickup_poses, delivery_poses)
+        return np.array([self.get_estimated_duration(pickup_pose, delivery_pose)
+                         for pickup_pose, delivery_pose in zip(pickup_poses, delivery_poses)], dtype=np.int64)
+
     def get_plan(self, pickup_pose, delivery_pose):
-        path = self.get_path(pickup_pose, delivery_pose)
-        estimated_duration = self.get_estimated_duration(pickup_pose, delivery_pose)
-        return {'path': path, 'estimated_duration': estimated_duration}
+        if self._in_duration_matrix(pickup_pose, delivery_pose):
+            return {'path': self.duration_matrix.get_path(pickup_pose, delivery_pose),
+                    'estimated_duration': self.duration_matrix.get_estimated_duration(pickup_pose, delivery_pose)}
+        path, estimated_duration = self._get_cached_plan(pickup_pose, delivery_pose)
+        return {'path': list(path), 'estimated_duration': estimated_duration}
 
 
 class DatasetCreator:
 
-    def __init__(self, task_type, map_name, dataset_meta):
+    def __init__(self, task_type, map_name, dataset_meta, seed=None, **kwargs):
+        """ seed (int): Seed of the random streams used to sample poses, task ids and intervals.
+        A given seed always produces the same dataset. If None, a random seed is used
+
+        kwargs['pose_creator']: PoseCreator of map_name to use. If None, the PoseCreator of map_name in the
+        creator_registry is used
+        """
         task_creator = TaskCreator(task_type)
-        pose_creator = PoseCreator(map_name)
+        pose_creator = kwargs.get('pose_creator')
+        if pose_creator is None:
+            pose_creator = creator_registry.get_pose_creator(map_name)
         dataset_creator_cls = dataset_factory.get_dataset_creator(dataset_meta.dataset_type)
-        self.dataset_creator = dataset_creator_cls(task_creator, pose_creator, dataset_meta)
+        self.dataset_creator = dataset_creator_cls(task_creator, pose_creator, dataset_meta, seed=seed)
+        # Process-wide collector of the counters and stage times of the generation, see utils.stats
+        self.stats = stats
 
     def create(self, **kwargs):
-        dataset = self.dataset_creator.create(**kwargs)
+        with stats.timer('create'):
+            dataset = self.dataset_creator.create(**kwargs)
         return dataset
+
+    def iter_tasks(self, **kwargs):
+        """ Yields the tasks of the dataset in dict format, e.g., to feed a JsonlWriter
+        """
+        return self.dataset_creator.iter_tasks(**kwargs)
+
+
+class CreatorRegistry:
+    """ Process-wide registry of planners and pose creators by map name
+
+    Loading a map into a Planner is expensive, so each map is loaded once and its planner (and pose creator,
+    with its plan cache and duration matrix) is shared by all the creators of the map until it is released
+    """
+    def __init__(self):
+        self._planners = {}
+        # Backend of each planner created by get_planner
+        self._backends = {}
+        self._pose_creators = {}
+
+    def get_planner(self, map_name, backend=None):
+        """ Returns the planner of map_name. If the map has no planner yet, it is created with the given
+        backend (see planners.planner_factory)
+
+        Raises ValueError if backend is given and the planner of map_name was created with another backend or
+        registered with register_planner. Release the map to create its planner with another backend
+        """
+        planner = self._planners.get(map_name)
+        if planner is None:
+            backend = planner_factory.get_backend(map_name, backend)
+            with stats.timer('load_planner'):
+                planner = planner_factory.get_planner(map_name, backend)
+            self._planners[map_name] = planner
+            self._backends[map_name] = backend
+        elif backend is not None and self._backends.get(map_name) != backend:
+            raise ValueError("The planner of map %s was not created with backend %s" % (map_name, backend))
+        return planner
+
+    def get_backend(self, map_name):
+        """ Returns the backend the planner of map_name was created with, or None if the planner was registered
+        with register_planner or the map has no planner
+        """
+        return self._backends.get(map_name)
+
+    def register_planner(self, map_name, planner):
+        """ Uses planner for map_name instead of creating one with the planner_factory
+        The planner must provide map_graph, get_path and get_estimated_duration (see planners)
+        """
+        self._planners[map_name] = planner
+        self._backends.pop(map_name, None)
+        self._pose_creators.pop(map_name, None)
+
+    def get_pose_creator(self, map_name, **kwargs):
+        """ Returns the PoseCreator of map_name. kwargs are passed to PoseCreator when it is created,
+        i.e., on the first call for map_name
+
+        Raises ValueError if the PoseCreator of map_name was created with a different value of any of kwargs.
+        Release the map to create a PoseCreator with another configuration
+        """
+        pose_creator = self._pose_creators.get(map_name)
+        if pose_creator is None:
+            pose_creator = PoseCreator(map_name, **kwargs)
+            self._pose_creators[map_name] = pose_creator
+        else:
+            mismatches = {key: value for key, value in kwargs.items() if pose_creator.config.get(key) != value}
+            if mismatches:
+                raise ValueError("The pose creator of map %s was created with %s, not with %s" %
+                                 (map_name, {key: pose_creator.config.get(key) for key in mismatches}, mismatches))
+        return pose_creator
+
+    def register_pose_creator(self, pose_creator):
+        self._planners[pose_creator.map_name] = pose_creator.planner
+        self._pose_creators[pose_creator.map_name] = pose_creator
+
+    def release(self, map_name):
+        """ Removes the planner and pose creator of map_name, so that they can be garbage collected
+        """
+        self._planners.pop(map_name, None)
+        self._backends.pop(map_name, None)
+        self._pose_creators.pop(map_name, None)
+
+    def clear(self):
+        self._planners.clear()
+        self._backends.clear()
+        self._pose_creators.clear()
+
+    def get_map_names(self):
+        return sorted(set(self._planners) | set(self._pose_creators))
+
+
+creator_registry = CreatorRegistry()
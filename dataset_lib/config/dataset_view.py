@@ -0,0 +1,159 @@
+import json
+
+import numpy as np
+from dataset_lib.config.factories import task_factory
+from dataset_lib.config.task_table import TaskTable
+
+
+class DatasetView:
+    """ Dataset returned by the loaders
+
+    The metadata (dataset_name, dataset_type, start_time, ...) is available right away, e.g., view['start_time']
+    The time window fields are available as numpy arrays, e.g., view.earliest_pickup_time
+    Task objects are only created when view['tasks'] or view.tasks is accessed or when the view is iterated
+
+    Tasks are ordered by task_id. The arrays hold the values as loaded, changes to Task objects are not reflected
+    """
+
+    def __init__(self, metadata, task_type, task_dicts=None, columns=None):
+        """
+        metadata (dict): dataset information, without the tasks
+        task_type (str): type of the tasks
+        task_dicts (list): tasks in dict format, ordered by task_id
+        columns (dict): arrays created by dataset_to_columns. Used if task_dicts is None
+        """
+        self._metadata = metadata
+        self._task_type = task_type
+        self._task_dicts = task_dicts
+        self._columns = columns
+        self._tasks = None
+        self._arrays = dict()
+
+    @classmethod
+    def from_dict(cls, dataset_dict, task_type):
+        metadata = {key: value for key, value in dataset_dict.items() if key != 'tasks'}
+        task_dicts = [task for _, task in sorted(dataset_dict.get('tasks').items())]
+        return cls(metadata, task_type, task_dicts=task_dicts)
+
+    @classmethod
+    def from_columns(cls, columns, task_type):
+        metadata = json.loads(str(columns['metadata']))
+        return cls(metadata, task_type, columns=columns)
+
+    def __getitem__(self, key):
+        if key == 'tasks':
+            return self.tasks
+        return self._metadata[key]
+
+    def __setitem__(self, key, value):
+        """ view['tasks'] = tasks replaces the tasks of the view. tasks is a dict of task dicts by task_id
+        (the format of dataset['tasks']) or a list of Task objects or task dicts. The arrays are rebuilt from
+        the new tasks
+        """
+        if key == 'tasks':
+            self._set_tasks(value)
+        else:
+            self._metadata[key] = value
+
+    def _set_tasks(self, tasks):
+        if isinstance(tasks, dict):
+            tasks = tasks.values()
+        task_dicts = [task if isinstance(task, dict) else task.to_dict() for task in tasks]
+        self._task_dicts = sorted(task_dicts, key=lambda task: task['task_id'])
+        self._columns = None
+        self._tasks = None
+        self._arrays = dict()
+
+    def __contains__(self, key):
+        return key == 'tasks' or key in self._metadata
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def keys(self):
+        return list(self._metadata) + ['tasks']
+
+    @property
+    def metadata(self):
+        return self._metadata
+
+    @property
+    def n_tasks(self):
+        if self._tasks is not None:
+            return len(self._tasks)
+        if self._task_dicts is not None:
+            return len(self._task_dicts)
+        return len(self._columns['task_id'])
+
+    @property
+    def tasks(self):
+        if self._tasks is None:
+            task_cls = task_factory.get_task_cls(self._task_type)
+            self._tasks = [task_cls.from_dict(task_info) for task_info in self.get_task_dicts()]
+        return self._tasks
+
+    def get_task_dicts(self):
+        """ Returns the tasks in dict format, without creating Task objects
+        """
+        if self._task_dicts is None:
+            self._task_dicts = list(self.table.iter_dicts())
+        return self._task_dicts
+
+    @property
+    def table(self):
+        """ Returns the tasks as a TaskTable. For datasets loaded from .npz files the arrays are not copied
+        """
+        if self._columns is not None:
+            return TaskTable.from_columns(self._columns)
+        return TaskTable.from_dicts(self._task_dicts)
+
+    def get_array(self, field):
+        """ Returns a numpy array with the values of a task field in
+        earliest_pickup_time, latest_pickup_time, estimated_duration or set_number
+        Arrays of datasets loaded from .npz files are not copied
+        """
+        array = self._arrays.get(field)
+        if array is None:
+            if self._columns is not None:
+                array = self._columns[field]
+            elif field == 'estimated_duration':
+                array = np.fromiter((task['plan'][field] for task in self._task_dicts), dtype=np.int64,
+                                    count=len(self._task_dicts))
+            else:
+                array = np.fromiter((task[field] for task in self._task_dicts), dtype=np.int64,
+                                    count=len(self._task_dicts))
+            self._arrays[field] = array
+        return array
+
+    @property
+    def earliest_pickup_time(self):
+        return self.get_array('earliest_pickup_time')
+
+    @property
+    def latest_pickup_time(self):
+        return self.get_array('latest_pickup_time')
+
+    @property
+    def estimated_duration(self):
+        return self.get_array('estimated_duration')
+
+    @property
+    def set_number(self):
+        return self.get_array('set_number')
+
+    def to_dict(self):
+        """ Returns the dataset as a dict that can be stored with store_as_yaml
+        If the tasks were replaced, e.g., view['tasks'] = tasks_dict, the new tasks are used
+        """
+        dataset = dict(self._metadata)
+        if self._tasks is None:
+            dataset['tasks'] = {task['task_id']: task for task in self.get_task_dicts()}
+        else:
+            # Task objects may have been changed
+            dataset['tasks'] = {task.task_id: task.to_dict() for task in self._tasks}
+        return dataset
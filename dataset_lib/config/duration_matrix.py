@@ -0,0 +1,203 @@
+""" Includes a precomputed matrix of estimated durations and paths between all goal poses of a map
+
+The matrix is stored as a directory of .npy files keyed by map name and map content hash, so that it can be
+memory-mapped and shared by several processes
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+FILE_NAMES = ['goals', 'durations', 'path_offsets', 'path_nodes', 'nodes']
+
+
+def get_duration_matrices_dir():
+    code_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+    return code_dir + '/durations/'
+
+
+def get_map_hash(map_graph):
+    """ Returns a hash of the nodes, edges and goals of the map graph
+
+    :param map_graph: graph of the map
+    :return: hex digest (str)
+    """
+    content = {'nodes': sorted(str(node) for node in map_graph.nodes()),
+               'goals': map_graph.graph.get('goals')}
+
+    if hasattr(map_graph, 'edges'):
+        content['edges'] = sorted(json.dumps([str(u), str(v), data], sort_keys=True, default=str)
+                                  for u, v, data in map_graph.edges(data=True))
+
+    dump = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha1(dump.encode('utf-8')).hexdigest()
+
+
+def get_goal_poses(map_graph):
+    """ Returns the goal poses of all map sections in the order of the map graph nodes
+    """
+    goals = set()
+    for section_goals in map_graph.graph['goals'].values():
+        goals.update(section_goals)
+    return [pose for pose in map_graph.nodes() if pose in goals]
+
+
+def get_duration_matrix_path(map_name, map_hash, directory=None):
+    if directory is None:
+        directory = get_duration_matrices_dir()
+    # map_name may be the path of a map file, see planners.get_map_file
+    map_name = os.path.splitext(os.path.basename(map_name))[0]
+    return os.path.join(directory, map_name + '_' + map_hash[:16])
+
+
+class DurationMatrix:
+    """ Estimated durations (mean + 2 * standard deviation, rounded to seconds) and paths between all
+    pairs of goal poses
+
+    goals (array): Names of the goal poses
+    durations (array): durations[i, j] is the estimated duration from goals[i] to goals[j]
+    path_offsets (array): The path from goals[i] to goals[j] is
+        path_nodes[path_offsets[i * n_goals + j]: path_offsets[i * n_goals + j + 1]]
+    path_nodes (array): Indices to nodes of all paths, concatenated
+    nodes (array): Names of the nodes in the paths
+    """
+
+    def __init__(self, goals, durations, path_offsets, path_nodes, nodes):
+        self.goals = goals
+        self.durations = durations
+        self.path_offsets = path_offsets
+        self.path_nodes = path_nodes
+        self.nodes = nodes
+        self._goal_index = {pose: i for i, pose in enumerate(goals.tolist())}
+        self._node_names = nodes.tolist()
+
+    def __contains__(self, poses):
+        pickup_pose, delivery_pose = poses
+        return pickup_pose in self._goal_index and delivery_pose in self._goal_index
+
+    def get_estimated_duration(self, pickup_pose, delivery_pose):
+        i = self._goal_index[pickup_pose]
+        j = self._goal_index[delivery_pose]
+        return int(self.durations[i, j])
+
+    def get_estimated_durations(self, pickup_poses, delivery_poses):
+        """ Returns an array with the estimated duration from each pickup pose to the delivery pose at the
+        same position
+        """
+        i = np.fromiter((self._goal_index[pose] for pose in pickup_poses), dtype=np.int64,
+                        count=len(pickup_poses))
+        j = np.fromiter((self._goal_index[pose] for pose in delivery_poses), dtype=np.int64,
+                        count=len(delivery_poses))
+        return self.durations[i, j].astype(np.int64)
+
+    def get_path(self, pickup_pose, delivery_pose):
+        pair = self._goal_index[pickup_pose] * len(self._goal_index) + self._goal_index[delivery_pose]
+        start, stop = self.path_offsets[pair], self.path_offsets[pair + 1]
+        return [self._node_names[k] for k in self.path_nodes[start:stop]]
+
+    @classmethod
+    def compute(cls, planner, goals=None):
+        """ Plans the paths between all pairs of goal poses of the planner's map
+
+        If the planner provides get_shortest_paths (e.g. GraphPlanner), all pairs are solved at once
+
+        :param planner: planner with map_graph, get_path and get_estimated_duration
+        :param goals: list of goal poses. If None, all goal poses of the map are used
+        :return: DurationMatrix
+        """
+        if goals is None:
+            goals = get_goal_poses(planner.map_graph)
+
+        if hasattr(planner, 'get_shortest_paths'):
+            return cls.compute_from_shortest_paths(planner, goals)
+
+        n_goals = len(goals)
+        durations = np.zeros((n_goals, n_goals), dtype=np.int32)
+        path_offsets = np.zeros(n_goals * n_goals + 1, dtype=np.int64)
+        path_nodes = list()
+        node_index = dict()
+
+        for i, pickup_pose in enumerate(goals):
+            for j, delivery_pose in enumerate(goals):
+                path = planner.get_path(pickup_pose, delivery_pose)
+                mean, variance = planner.get_estimated_duration(path)
+                # Round to seconds
+                durations[i, j] = round(mean + 2*(variance**0.5))
+                path_nodes.extend(node_index.setdefault(node, len(node_index)) for node in path)
+                path_offsets[i * n_goals + j + 1] = len(path_nodes)
+
+        nodes = sorted(node_index, key=node_index.get)
+
+        return cls(np.array(goals, dtype=str), durations, path_offsets,
+                   np.array(path_nodes, dtype=np.int32), np.array(nodes, dtype=str))
+
+    @classmethod
+    def compute_from_shortest_paths(cls, planner, goals):
+        """ Computes the matrix from the shortest path trees of the goal poses, see GraphPlanner.get_shortest_paths
+        """
+        nodes = planner.map_graph.nodes()
+        node_index = planner.map_graph.node_index
+        goal_indices = [node_index[pose] for pose in goals]
+
+        means, variances, predecessors = planner.get_shortest_paths(goals)
+        means = means[:, goal_indices]
+        variances = variances[:, goal_indices]
+        unreachable = np.argwhere(np.isinf(means))
+        if len(unreachable):
+            i, j = unreachable[0]
+            raise ValueError("No path from %s to %s" % (goals[i], goals[j]))
+        # Round to seconds (half to even, as round())
+        durations = np.rint(means + 2*np.sqrt(variances)).astype(np.int32)
+
+        n_goals = len(goals)
+        path_offsets = np.zeros(n_goals * n_goals + 1, dtype=np.int64)
+        path_nodes = list()
+        for i, source_index in enumerate(goal_indices):
+            source_predecessors = predecessors[i].tolist()
+            for j, target_index in enumerate(goal_indices):
+                path_nodes.extend(planner.get_path_indices(source_predecessors, source_index, target_index))
+                path_offsets[i * n_goals + j + 1] = len(path_nodes)
+
+        return cls(np.array(goals, dtype=str), durations, path_offsets, np.array(path_nodes, dtype=np.int32),
+                   np.array(nodes, dtype=str))
+
+    def save(self, path):
+        """ Writes the matrix to the directory path. The directory is first written to a temporary location and
+        then renamed, so readers never see a partially written matrix
+        """
+        parent_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=parent_dir, prefix='.tmp_')
+        try:
+            for file_name in FILE_NAMES:
+                np.save(os.path.join(tmp_dir, file_name + '.npy'), getattr(self, file_name))
+            os.rename(tmp_dir, path)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(path):
+                raise
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """ Loads the matrix stored in the directory path. The arrays are memory-mapped by default
+
+        :param path: directory of the matrix
+        :param mmap_mode: mmap_mode passed to numpy.load. If None, the arrays are read into memory
+        :return: DurationMatrix
+        """
+        arrays = {file_name: np.load(os.path.join(path, file_name + '.npy'), mmap_mode=mmap_mode)
+                  for file_name in FILE_NAMES}
+        return cls(**arrays)
+
+
+def load_duration_matrix(map_name, map_graph, directory=None):
+    """ Returns the DurationMatrix of the map, or None if it has not been precomputed
+    """
+    path = get_duration_matrix_path(map_name, get_map_hash(map_graph), directory)
+    if not os.path.isdir(path):
+        return None
+    return DurationMatrix.load(path)
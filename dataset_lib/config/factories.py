@@ -1,8 +1,13 @@
 import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 from importlib import import_module
 
 import numpy as np
+from dataset_lib.utils.stats import stats
 from dataset_lib.utils.utils import AsDictionaryMixin
+from dataset_lib.utils.uuid import generate_uuid
 
 
 class TaskFactory:
@@ -88,10 +93,13 @@ class DatasetMeta(AsDictionaryMixin):
 
 
 class Interval(AsDictionaryMixin):
-    def __init__(self, interval_type, lower_bound, upper_bound):
+    def __init__(self, interval_type, lower_bound, upper_bound, rng=None):
+        """ rng: numpy Generator used to draw random intervals. If None, the global numpy random state is used
+        """
         self.interval_type = interval_type
         self.lower_bound = lower_bound
         self.upper_bound = upper_bound
+        self._rng = rng
 
     def __str__(self):
         return "{}: [{}, {}]".format(self.interval_type, self.lower_bound, self.upper_bound)
@@ -102,30 +110,128 @@ class Interval(AsDictionaryMixin):
         elif self.interval_type == 'loose':
             interval = self.upper_bound
         elif self.interval_type == 'random':
-            interval = np.random.uniform(self.lower_bound, self.upper_bound)
+            interval = self.get_rng(kwargs.get('rng')).uniform(self.lower_bound, self.upper_bound)
         else:
             raise ValueError(self.interval_type)
         # Round to seconds
         return round(interval)
 
+    def get_rng(self, rng=None):
+        """ Returns rng, or the Generator of the interval if rng is None, or the global numpy random state
+        """
+        if rng is not None:
+            return rng
+        if self._rng is not None:
+            return self._rng
+        return np.random
+
+    def sample(self, n, rng=None):
+        """ Returns an array of n intervals rounded to seconds
+        """
+        fixed_value = self.get_fixed_value()
+        if fixed_value is not None:
+            return np.full(n, round(fixed_value), dtype=np.int64)
+        values = self.get_rng(rng).uniform(self.lower_bound, self.upper_bound, size=n)
+        # Round to seconds (half to even, as round())
+        return np.rint(values).astype(np.int64)
+
+    def get_fixed_value(self):
+        """ Returns the value of a tight or loose interval and None for a random interval
+        """
+        if self.interval_type == 'tight':
+            return self.lower_bound
+        elif self.interval_type == 'loose':
+            return self.upper_bound
+        elif self.interval_type == 'random':
+            return None
+        raise ValueError(self.interval_type)
+
+
+def sample_alternating(first_interval, second_interval, n, rng=None):
+    """ Returns the values of calling first_interval n times and second_interval n - 1 times alternately,
+    starting with first_interval, i.e., first(), second(), first(), ..., first()
+
+    All random values are drawn with a single call to uniform, which draws them from the random stream
+    in the same order and with the same values as the alternating calls
+    rng: numpy Generator. If None, the Generator of first_interval is used (see Interval.get_rng)
+
+    :return: (array of n first_interval values, array of n - 1 second_interval values)
+    """
+    is_first = np.arange(2*n - 1) % 2 == 0
+    fixed_values = [first_interval.get_fixed_value(), second_interval.get_fixed_value()]
+
+    values = np.where(is_first, fixed_values[0] or 0, fixed_values[1] or 0).astype(float)
+    is_random = np.where(is_first, fixed_values[0] is None, fixed_values[1] is None)
+    if is_random.any():
+        lower_bounds = np.where(is_first, first_interval.lower_bound, second_interval.lower_bound)
+        upper_bounds = np.where(is_first, first_interval.upper_bound, second_interval.upper_bound)
+        values[is_random] = first_interval.get_rng(rng).uniform(lower_bounds[is_random], upper_bounds[is_random])
+
+    # Round to seconds (half to even, as round())
+    values = np.rint(values).astype(np.int64)
+    return values[0::2], values[1::2]
+
+
+def get_rng(seed_sequence, *spawn_key):
+    """ Returns a numpy Generator for the stream spawn_key derived from seed_sequence
+    The same seed_sequence and spawn_key always give the same stream, independently of the order of the calls
+    or of the process in which they are made
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed_sequence.entropy,
+                                                        spawn_key=seed_sequence.spawn_key + spawn_key))
+
 
 class OverlappingTW:
-    def __init__(self, task_creator, pose_creator, dataset_meta):
+    def __init__(self, task_creator, pose_creator, dataset_meta, seed=None):
         """ Creates datasets with overlapping time windows
+
+        Set i is sampled with the random stream (i, 0) and constrained with the random stream (i, 1)
+        derived from seed
         """
         self.task_creator = task_creator
         self.pose_creator = pose_creator
         self.dataset_meta = dataset_meta
+        self.seed_sequence = np.random.SeedSequence(seed)
 
     def create(self, n_tasks, n_overlapping_sets, **kwargs):
+        """ If task_table is True, dataset['tasks'] is a TaskTable instead of a dict of task dicts
+
+        If workers > 1, the sets are generated in a pool of workers processes. Each set uses the same random
+        stream as in the serial generation, so the dataset is the same for the same seed. kwargs['mp_context']
+        selects the start method of the pool (see iter_tasks_sets_parallel)
+        """
         dataset = self.dataset_meta.to_dict()
         dataset['tasks'] = dict()
+        tasks = dict()
+
+        for i, tasks_set in self.iter_tasks_sets(n_tasks, n_overlapping_sets, **kwargs):
+            tasks[i] = tasks_set
+            for task in tasks_set:
+                dataset["tasks"][task.task_id] = task.to_dict()
+
+        if kwargs.get('task_table'):
+            dataset['tasks'] = get_task_table(dataset['tasks'])
+
+        return dataset, tasks
+
+    def iter_tasks(self, n_tasks, n_overlapping_sets, **kwargs):
+        """ Yields the tasks of the dataset in dict format. Only one set of tasks is kept in memory
+        Takes the same kwargs as create
+        """
+        for _, tasks_set in self.iter_tasks_sets(n_tasks, n_overlapping_sets, **kwargs):
+            for task in tasks_set:
+                yield task.to_dict()
+
+    def iter_tasks_sets(self, n_tasks, n_overlapping_sets, **kwargs):
+        """ Yields (set number, tasks set) with temporal constraints, one set at a time
+
+        kwargs['tasks']: dict of tasks sets (without temporal constraints) by set number. If None, the sets are
+        created
+        """
         tasks = kwargs.get("tasks")
         duration_range = kwargs.get('duration_range')
 
         if tasks is None:
-            tasks = dict()
-
             n_tasks_sets = [int(n_tasks / n_overlapping_sets)] * n_overlapping_sets
             if n_tasks % n_overlapping_sets != 0:
                 n_tasks_sets.append(n_tasks % n_overlapping_sets)
@@ -133,57 +239,117 @@ class OverlappingTW:
             map_sections = self.dataset_meta.map_sections * round(len(n_tasks_sets)/len(self.dataset_meta.map_sections))
 
             # Use a map section per tasks_set
-            for i, (n_tasks_set, map_section) in enumerate(zip(n_tasks_sets, map_sections)):
-                tasks_set = get_tasks_set(self.task_creator, self.pose_creator, duration_range, n_tasks_set, [map_section], i)
-                tasks_set = order_by_estimated_durations(tasks_set)
-                tasks[i] = tasks_set
+            sets_args = [(duration_range, n_tasks_set, [map_section], i, self.seed_sequence.entropy,
+                          self.seed_sequence.spawn_key + (i, 0))
+                         for i, (n_tasks_set, map_section) in enumerate(zip(n_tasks_sets, map_sections))]
+
+            workers = kwargs.get('workers')
+            if workers and workers > 1:
+                tasks_sets = self.iter_tasks_sets_parallel(sets_args, workers, kwargs.get('mp_context'))
+            else:
+                tasks_sets = (create_tasks_set(self.task_creator, self.pose_creator, *set_args)
+                              for set_args in sets_args)
+            tasks = zip([set_args[3] for set_args in sets_args], tasks_sets)
+        else:
+            tasks = tasks.items()
 
-        for i, tasks_set in tasks.items():
+        for i, tasks_set in tasks:
             tasks_set = add_constraints(tasks_set, self.dataset_meta.pickup_time_interval,
                                         self.dataset_meta.time_window_interval, self.dataset_meta.start_time,
-                                        self.pose_creator)
-            for task in tasks_set:
-                dataset["tasks"][task.task_id] = task.to_dict()
+                                        self.pose_creator, rng=get_rng(self.seed_sequence, i, 1))
+            yield i, tasks_set
 
-        return dataset, tasks
+    def iter_tasks_sets_parallel(self, sets_args, workers, mp_context=None):
+        """ Creates the sets in a pool of processes and yields them in the order of sets_args. Each worker builds
+        its own creators once and starts with the plans already cached by the pose creator of this process;
+        a precomputed DurationMatrix is memory-mapped, so its pages are shared by all workers
+
+        Workers do not rely on inheriting the creator_registry of this process, so any start method works.
+        A planner registered with creator_registry.register_planner is sent to the workers, which requires it to
+        be picklable; a planner created by the planner_factory is created again by each worker
+
+        mp_context: multiprocessing context or start method ('fork', 'spawn', 'forkserver') of the pool.
+        If None, the default start method is used
+        """
+        creators = import_module('dataset_lib.config.creators')
+        map_name = self.pose_creator.map_name
+        planner = None if creators.creator_registry.get_backend(map_name) else self.pose_creator.planner
+        if isinstance(mp_context, str):
+            mp_context = multiprocessing.get_context(mp_context)
+        initargs = (self.task_creator.task_type, map_name, self.pose_creator.config,
+                    self.pose_creator.plan_cache.items(), planner)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_tasks_set_worker,
+                                 initargs=initargs) as executor:
+            for tasks_set, worker_stats in executor.map(_create_tasks_set_in_worker, sets_args):
+                stats.merge(worker_stats)
+                yield tasks_set
 
 
 class NonOverlappingTW:
-    def __init__(self, task_creator, pose_creator, dataset_meta):
+    def __init__(self, task_creator, pose_creator, dataset_meta, seed=None):
         """ Creates datasets with non overlapping time windows
+
+        The set is sampled with the random stream (0, 0) and constrained with the random stream (0, 1)
+        derived from seed
         """
         self.task_creator = task_creator
         self.pose_creator = pose_creator
         self.dataset_meta = dataset_meta
+        self.seed_sequence = np.random.SeedSequence(seed)
 
     def create(self, n_tasks, **kwargs):
+        """ If task_table is True, dataset['tasks'] is a TaskTable instead of a dict of task dicts
+        """
         dataset = self.dataset_meta.to_dict()
         dataset['tasks'] = dict()
-        tasks = kwargs.get("tasks")
-        duration_range = kwargs.get('duration_range')
 
-        if tasks is None:
-            tasks = get_tasks_set(self.task_creator, self.pose_creator, duration_range, n_tasks, self.dataset_meta.map_sections)
-            tasks = order_by_estimated_durations(tasks)
-
-        tasks = add_constraints(tasks, self.dataset_meta.pickup_time_interval, self.dataset_meta.pickup_time_interval,
-                                self.dataset_meta.start_time, self.pose_creator)
+        tasks = self.create_tasks(n_tasks, **kwargs)
 
         for task in tasks:
             dataset["tasks"][task.task_id] = task.to_dict()
 
+        if kwargs.get('task_table'):
+            dataset['tasks'] = get_task_table(dataset['tasks'])
+
         return dataset, tasks
 
+    def iter_tasks(self, n_tasks, **kwargs):
+        """ Yields the tasks of the dataset in dict format. Takes the same kwargs as create
+        """
+        for task in self.create_tasks(n_tasks, **kwargs):
+            yield task.to_dict()
+
+    def create_tasks(self, n_tasks, **kwargs):
+        """ Returns the tasks with temporal constraints
+
+        kwargs['tasks']: tasks without temporal constraints. If None, the tasks are created
+        """
+        tasks = kwargs.get("tasks")
+        duration_range = kwargs.get('duration_range')
+
+        if tasks is None:
+            tasks = get_tasks_set(self.task_creator, self.pose_creator, duration_range, n_tasks,
+                                  self.dataset_meta.map_sections, rng=get_rng(self.seed_sequence, 0, 0))
+            tasks = order_by_estimated_durations(tasks)
+
+        return add_constraints(tasks, self.dataset_meta.pickup_time_interval, self.dataset_meta.pickup_time_interval,
+                               self.dataset_meta.start_time, self.pose_creator, rng=get_rng(self.seed_sequence, 0, 1))
 
-def get_tasks_set(task_creator, pose_creator, duration_range, n_tasks_set, map_sections, set_number=1):
+
+def get_tasks_set(task_creator, pose_creator, duration_range, n_tasks_set, map_sections, set_number=1, rng=None):
     """ Returns tasks without temporal information
+
+    rng: numpy Generator used to draw the poses and task ids
     """
     tasks = list()
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
 
-    logging.debug("Getting a set of %s consecutive tasks using map_sections %s", n_tasks_set, map_sections)
+    if debug:
+        logging.debug("Getting a set of %s consecutive tasks using map_sections %s", n_tasks_set, map_sections)
 
+    start_time = time.perf_counter()
     for j in range(0, n_tasks_set):
-        pickup_pose, delivery_pose = pose_creator.get_poses(map_sections, duration_range)
+        pickup_pose, delivery_pose = pose_creator.get_poses(map_sections, duration_range, rng)
         plan = pose_creator.get_plan(pickup_pose, delivery_pose)
 
         _task_args = {'pickup_location': pickup_pose,
@@ -191,53 +357,114 @@ def get_tasks_set(task_creator, pose_creator, duration_range, n_tasks_set, map_s
                       'plan': plan,
                       'set_number': set_number
                       }
+        if rng is not None:
+            _task_args['task_id'] = generate_uuid(rng)
 
         task = task_creator.create(**_task_args)
 
-        logging.debug("Task: %s", task.task_id)
+        if debug:
+            logging.debug("Task: %s", task.task_id)
 
         tasks.append(task)
 
+    stats.add_time('get_tasks_set', time.perf_counter() - start_time)
+    stats.count('tasks', n_tasks_set)
     return tasks
 
 
+def create_tasks_set(task_creator, pose_creator, duration_range, n_tasks_set, map_sections, set_number, entropy,
+                     spawn_key):
+    """ Returns a set of tasks without temporal information ordered by estimated duration, sampled with the
+    random stream given by (entropy, spawn_key)
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=spawn_key))
+    tasks_set = get_tasks_set(task_creator, pose_creator, duration_range, n_tasks_set, map_sections, set_number,
+                              rng=rng)
+    return order_by_estimated_durations(tasks_set)
+
+
+# Creators of a worker process, see OverlappingTW.iter_tasks_sets_parallel
+_worker_creators = dict()
+
+
+def _init_tasks_set_worker(task_type, map_name, pose_creator_config, cached_plans, planner=None):
+    creators = import_module('dataset_lib.config.creators')
+    if planner is not None:
+        creators.creator_registry.register_planner(map_name, planner)
+    pose_creator = creators.PoseCreator(map_name, **pose_creator_config)
+    pose_creator.plan_cache.update(cached_plans)
+    creators.creator_registry.register_pose_creator(pose_creator)
+    _worker_creators['task_creator'] = creators.TaskCreator(task_type)
+    _worker_creators['pose_creator'] = pose_creator
+
+
+def _create_tasks_set_in_worker(set_args):
+    """ Returns the tasks set and the stats of its creation, which are merged into the stats of the parent
+    """
+    stats.reset()
+    tasks_set = create_tasks_set(_worker_creators['task_creator'], _worker_creators['pose_creator'], *set_args)
+    return tasks_set, stats.to_dict()
+
+
+def get_task_table(tasks_dict):
+    """ Returns a TaskTable with the tasks in tasks_dict ordered by task_id
+    """
+    task_table_cls = getattr(import_module('dataset_lib.config.task_table'), 'TaskTable')
+    return task_table_cls.from_dicts(task for _, task in sorted(tasks_dict.items()))
+
+
 def order_by_estimated_durations(tasks):
     return sorted(tasks, key=lambda task: task.plan.estimated_duration)
 
 
-def add_constraints(tasks, pickup_time_interval, time_window_interval, dataset_start_time, pose_creator):
+def add_constraints(tasks, pickup_time_interval, time_window_interval, dataset_start_time, pose_creator, rng=None):
     """
     Adds temporal constraints to a set of consecutive tasks
-    """
 
-    for i, task in enumerate(tasks):
-        logging.debug("Task: %s", task.task_id)
-        if i > 0:
-            last_task = tasks[i-1]
-            logging.debug("Last task: %s", last_task.task_id)
+    The earliest pickup time (ept) and latest pickup time (lpt) of task i are:
+        ept_0 = dataset_start_time
+        ept_i = lpt_{i-1} + estimated_duration_{i-1} + travel_time_i + time_window_interval_i
+        lpt_i = ept_i + pickup_time_interval_i
+    where travel_time_i is the estimated time to go from the delivery location of task i-1 to the pickup location
+    of task i. The recurrence is computed as a cumulative sum over all tasks of the set
+
+    rng: numpy Generator used to draw random intervals (see Interval.get_rng)
+    """
+    n_tasks = len(tasks)
+    if n_tasks == 0:
+        return tasks
 
-            # The finish (delivery) of last task is the latest pickup time plus the estimated time to go from
-            # the pickup to the delivery location
-            finish_last_task = last_task.latest_pickup_time + last_task.plan.estimated_duration
-            logging.debug("Finish last task: %s", finish_last_task)
+    start_time = time.perf_counter()
+    estimated_durations = np.array([task.plan.estimated_duration for task in tasks], dtype=np.int64)
 
-            # The travel path is the path between the delivery location of last task and the pickup of this task
-            travel_path = pose_creator.get_plan(last_task.delivery_location, task.pickup_location)
+    # The travel time is the estimated time to go from the delivery of last task to the pickup of this task
+    travel_times = pose_creator.get_estimated_durations([task.delivery_location for task in tasks[:-1]],
+                                                        [task.pickup_location for task in tasks[1:]])
 
-            # The travel time is the estimated time to go from the delivery of last task to the pickup of this task
-            travel_time = travel_path.get('estimated_duration')
-            logging.debug("Travel time: %s", travel_time)
+    pickup_time_intervals, time_window_intervals = sample_alternating(pickup_time_interval, time_window_interval,
+                                                                      n_tasks, rng)
 
-            task.earliest_pickup_time = finish_last_task + travel_time + time_window_interval()
+    # The finish (delivery) of last task is the latest pickup time plus the estimated time to go from
+    # the pickup to the delivery location
+    increments = pickup_time_intervals[:-1] + estimated_durations[:-1] + travel_times + time_window_intervals
 
-        else:
-            task.earliest_pickup_time = dataset_start_time
+    earliest_pickup_times = np.empty(n_tasks, dtype=np.int64)
+    earliest_pickup_times[0] = dataset_start_time
+    np.cumsum(increments, out=earliest_pickup_times[1:])
+    earliest_pickup_times[1:] += dataset_start_time
+    latest_pickup_times = earliest_pickup_times + pickup_time_intervals
 
-        task.latest_pickup_time = task.earliest_pickup_time + pickup_time_interval()
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    for task, earliest_pickup_time, latest_pickup_time in zip(tasks, earliest_pickup_times.tolist(),
+                                                              latest_pickup_times.tolist()):
+        task.earliest_pickup_time = earliest_pickup_time
+        task.latest_pickup_time = latest_pickup_time
 
-        logging.debug("Task %s earliest pickup time: %s", task.task_id, task.earliest_pickup_time)
-        logging.debug("Task %s latest pickup time: %s", task.task_id, task.latest_pickup_time)
+        if debug:
+            logging.debug("Task %s earliest pickup time: %s, latest pickup time: %s", task.task_id,
+                          task.earliest_pickup_time, task.latest_pickup_time)
 
+    stats.add_time('add_constraints', time.perf_counter() - start_time)
     return tasks
 
 
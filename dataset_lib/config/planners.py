@@ -0,0 +1,293 @@
+""" Planner backends used by PoseCreator
+
+A planner provides:
+    map_graph: graph of the map with nodes() and graph['goals'] (dict of map section to goal poses)
+    get_path(source, target): list of nodes from source to target
+    get_estimated_duration(path): (mean, variance) of the duration of the path
+
+Planners that can solve many queries at once also provide get_shortest_paths(sources), see GraphPlanner.
+DurationMatrix.compute uses it when it is available
+"""
+
+import heapq
+import os
+from importlib import import_module
+
+import numpy as np
+from dataset_lib.utils.datasets import load_yaml
+
+# Maps with at most this number of nodes are solved with Floyd-Warshall, larger maps with Dijkstra per source
+FLOYD_WARSHALL_MAX_NODES = 200
+
+
+class PlannerFactory:
+    """ Registers a function that creates the planner of a map by backend name
+    """
+    def __init__(self):
+        self._backends = {}
+
+    def register_backend(self, backend, create_planner):
+        self._backends[backend] = create_planner
+
+    def get_backends(self):
+        return sorted(self._backends)
+
+    def get_backend(self, map_name, backend=None):
+        """ Returns the backend used for map_name: backend if given. Otherwise, the graph backend if there is
+        a map file for map_name (see get_map_file) and the planner package backend if there is not
+        """
+        if backend is None:
+            backend = 'graph' if get_map_file(map_name) else 'planner'
+        return backend
+
+    def get_planner(self, map_name, backend=None):
+        """ Returns a planner of map_name
+
+        :param map_name: name of the map
+        :param backend: name of a registered backend. If None, the backend is chosen by get_backend
+        """
+        backend = self.get_backend(map_name, backend)
+        create_planner = self._backends.get(backend)
+        if not create_planner:
+            raise ValueError(backend)
+        return create_planner(map_name)
+
+
+def get_maps_dir():
+    code_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+    return code_dir + '/maps/'
+
+
+def get_map_file(map_name):
+    """ Returns map_name if it is a yaml file, or the file maps/<map_name>.yaml if it exists, or None
+    """
+    if map_name.endswith('.yaml') and os.path.isfile(map_name):
+        return map_name
+    map_file = get_maps_dir() + map_name + '.yaml'
+    if os.path.isfile(map_file):
+        return map_file
+    return None
+
+
+class MapGraph:
+    """ Array-backed directed graph with a duration mean and variance per edge
+
+    nodes (list): names of the nodes
+    sources, targets (array): indices to nodes of the edges
+    means, variances (array): duration mean and variance of the edges
+    goals (dict): goal poses per map section
+    """
+
+    def __init__(self, nodes, sources, targets, means, variances, goals):
+        self._nodes = list(nodes)
+        self.node_index = {node: i for i, node in enumerate(self._nodes)}
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.means = np.asarray(means, dtype=float)
+        self.variances = np.asarray(variances, dtype=float)
+        self.graph = {'goals': goals}
+
+        # Compressed sparse rows: the out edges of node i are edge_order[offsets[i]:offsets[i+1]]
+        self.edge_order = np.argsort(self.sources, kind='stable')
+        self.offsets = np.zeros(len(self._nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=len(self._nodes)), out=self.offsets[1:])
+
+    @classmethod
+    def from_dict(cls, map_dict):
+        """ Creates a MapGraph from a dict with:
+            goals: dict of map section to list of goal poses
+            edges: list of [source, target, mean, variance] or of dicts with these keys
+            directed (bool): if False (default), each edge can be traversed in both directions
+            nodes (list): optional, order of the nodes. By default, nodes are ordered by first appearance
+        """
+        edges = [(edge['source'], edge['target'], edge['mean'], edge['variance']) if isinstance(edge, dict)
+                 else tuple(edge) for edge in map_dict['edges']]
+        if not map_dict.get('directed', False):
+            edges += [(target, source, mean, variance) for source, target, mean, variance in edges]
+
+        node_index = {node: i for i, node in enumerate(map_dict.get('nodes', list()))}
+        for source, target, _, _ in edges:
+            node_index.setdefault(source, len(node_index))
+            node_index.setdefault(target, len(node_index))
+        for section_goals in map_dict['goals'].values():
+            for pose in section_goals:
+                node_index.setdefault(pose, len(node_index))
+
+        return cls(sorted(node_index, key=node_index.get),
+                   [node_index[source] for source, _, _, _ in edges],
+                   [node_index[target] for _, target, _, _ in edges],
+                   [mean for _, _, mean, _ in edges],
+                   [variance for _, _, _, variance in edges],
+                   map_dict['goals'])
+
+    @classmethod
+    def from_yaml(cls, map_file):
+        return cls.from_dict(load_yaml(map_file))
+
+    def nodes(self):
+        return list(self._nodes)
+
+    def edges(self, data=False):
+        for source, target, mean, variance in zip(self.sources.tolist(), self.targets.tolist(),
+                                                  self.means.tolist(), self.variances.tolist()):
+            if data:
+                yield self._nodes[source], self._nodes[target], {'mean': mean, 'variance': variance}
+            else:
+                yield self._nodes[source], self._nodes[target]
+
+
+class GraphPlanner:
+    """ Planner of a MapGraph. Paths are the paths with the lowest duration mean
+
+    Queries are answered from shortest path trees computed for many sources at once: with a vectorized
+    Floyd-Warshall for maps up to FLOYD_WARSHALL_MAX_NODES nodes and with Dijkstra per source for larger maps.
+    The trees are computed on the first query and kept
+    """
+
+    def __init__(self, map_graph):
+        self.map_graph = map_graph
+        n_nodes = len(map_graph.node_index)
+        self._edges = dict()
+        for source, target, mean, variance in zip(map_graph.sources.tolist(), map_graph.targets.tolist(),
+                                                  map_graph.means.tolist(), map_graph.variances.tolist()):
+            if (source, target) not in self._edges or mean < self._edges[(source, target)][0]:
+                self._edges[(source, target)] = (mean, variance)
+        # Out edges of each node as lists, for Dijkstra
+        edge_order = map_graph.edge_order
+        self._adjacency = (map_graph.offsets.tolist(), map_graph.targets[edge_order].tolist(),
+                           map_graph.means[edge_order].tolist(), map_graph.variances[edge_order].tolist())
+        # Shortest path tree of each source: (means, variances, predecessors) arrays of length n_nodes
+        self._trees = dict()
+        self._all_pairs = None
+        self._use_floyd_warshall = n_nodes <= FLOYD_WARSHALL_MAX_NODES
+
+    @classmethod
+    def from_map_name(cls, map_name):
+        map_file = get_map_file(map_name)
+        if map_file is None:
+            raise ValueError("No map file for map %s" % map_name)
+        return cls(MapGraph.from_yaml(map_file))
+
+    def solve_all_pairs(self):
+        """ Computes the shortest paths between all pairs of nodes with a vectorized Floyd-Warshall
+
+        :return: means, variances and predecessors (n_nodes x n_nodes arrays). predecessors[i, j] is the node
+        before j in the path from i to j, or -1 if there is no path
+        """
+        if self._all_pairs is None:
+            n_nodes = len(self.map_graph.node_index)
+            means = np.full((n_nodes, n_nodes), np.inf)
+            variances = np.zeros((n_nodes, n_nodes))
+            predecessors = np.full((n_nodes, n_nodes), -1, dtype=np.int64)
+
+            edges = list(self._edges.items())
+            sources = np.array([source for (source, _), _ in edges], dtype=np.int64)
+            targets = np.array([target for (_, target), _ in edges], dtype=np.int64)
+            means[sources, targets] = [mean for _, (mean, _) in edges]
+            variances[sources, targets] = [variance for _, (_, variance) in edges]
+            predecessors[sources, targets] = sources
+            np.fill_diagonal(means, 0)
+            np.fill_diagonal(variances, 0)
+            np.fill_diagonal(predecessors, np.arange(n_nodes))
+
+            through_k = np.empty((n_nodes, n_nodes))
+            shorter = np.empty((n_nodes, n_nodes), dtype=bool)
+            for k in range(n_nodes):
+                np.add(means[:, k, None], means[None, k, :], out=through_k)
+                np.less(through_k, means, out=shorter)
+                if not shorter.any():
+                    continue
+                np.copyto(means, through_k, where=shorter)
+                np.add(variances[:, k, None], variances[None, k, :], out=through_k)
+                np.copyto(variances, through_k, where=shorter)
+                np.copyto(predecessors, np.broadcast_to(predecessors[k], (n_nodes, n_nodes)), where=shorter)
+
+            self._all_pairs = (means, variances, predecessors)
+        return self._all_pairs
+
+    def _dijkstra(self, source):
+        n_nodes = len(self.map_graph.node_index)
+        offsets, targets, edge_means, edge_variances = self._adjacency
+        means = [float('inf')] * n_nodes
+        variances = [0.0] * n_nodes
+        predecessors = [-1] * n_nodes
+        means[source] = 0.0
+        predecessors[source] = source
+
+        queue = [(0.0, source)]
+        while queue:
+            mean, node = heapq.heappop(queue)
+            if mean > means[node]:
+                continue
+            for k in range(offsets[node], offsets[node + 1]):
+                target = targets[k]
+                new_mean = mean + edge_means[k]
+                if new_mean < means[target]:
+                    means[target] = new_mean
+                    variances[target] = variances[node] + edge_variances[k]
+                    predecessors[target] = node
+                    heapq.heappush(queue, (new_mean, target))
+
+        return np.array(means), np.array(variances), np.array(predecessors, dtype=np.int64)
+
+    def get_shortest_paths(self, sources):
+        """ Returns the shortest path trees of the source nodes
+
+        :param sources: list of node names
+        :return: means, variances and predecessors (len(sources) x n_nodes arrays)
+        """
+        indices = [self.map_graph.node_index[source] for source in sources]
+        if self._use_floyd_warshall:
+            means, variances, predecessors = self.solve_all_pairs()
+            return means[indices], variances[indices], predecessors[indices]
+
+        trees = [self._get_tree(i) for i in indices]
+        return (np.array([tree[0] for tree in trees]), np.array([tree[1] for tree in trees]),
+                np.array([tree[2] for tree in trees]))
+
+    def _get_tree(self, source_index):
+        tree = self._trees.get(source_index)
+        if tree is None:
+            tree = self._dijkstra(source_index)
+            self._trees[source_index] = tree
+        return tree
+
+    def get_path_indices(self, predecessors, source_index, target_index):
+        """ Returns the node indices of the path from source_index to target_index given the predecessors
+        of source_index
+        """
+        if predecessors[target_index] == -1:
+            raise ValueError("No path from %s to %s" % (self.map_graph.nodes()[source_index],
+                                                        self.map_graph.nodes()[target_index]))
+        path = [target_index]
+        while path[-1] != source_index:
+            path.append(int(predecessors[path[-1]]))
+        return path[::-1]
+
+    def get_path(self, source, target):
+        source_index = self.map_graph.node_index[source]
+        if self._use_floyd_warshall:
+            predecessors = self.solve_all_pairs()[2][source_index]
+        else:
+            predecessors = self._get_tree(source_index)[2]
+        nodes = self.map_graph.nodes()
+        return [nodes[i] for i in self.get_path_indices(predecessors, source_index,
+                                                        self.map_graph.node_index[target])]
+
+    def get_estimated_duration(self, path):
+        """ Returns the mean and variance of the duration of the path
+        """
+        node_index = self.map_graph.node_index
+        edges = [self._edges[(node_index[u], node_index[v])] for u, v in zip(path, path[1:])]
+        return sum(mean for mean, _ in edges), sum(variance for _, variance in edges)
+
+
+def _load_planner(map_name):
+    # Imported here so that the planner package is only needed by this backend
+    planner_cls = getattr(import_module('planner.planner'), 'Planner')
+    return planner_cls(map_name)
+
+
+planner_factory = PlannerFactory()
+planner_factory.register_backend('planner', _load_planner)
+planner_factory.register_backend('graph', GraphPlanner.from_map_name)
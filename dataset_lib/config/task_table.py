@@ -0,0 +1,149 @@
+import numpy as np
+from dataset_lib.config.factories import task_factory
+
+
+class TaskTable:
+    """ Struct-of-arrays representation of a list of tasks
+
+    Each task field is a typed numpy array, the i-th element of every array belongs to the i-th task
+    Pose names are stored once in nodes; pickup_location and delivery_location are indices to nodes
+    The path of task i is nodes[path_nodes[path_offsets[i]:path_offsets[i+1]]]
+    """
+    columns = ['task_id', 'pickup_location', 'delivery_location', 'hard_constraints', 'earliest_pickup_time',
+               'latest_pickup_time', 'estimated_duration', 'set_number', 'path_offsets', 'path_nodes', 'nodes']
+
+    def __init__(self, task_id, pickup_location, delivery_location, hard_constraints, earliest_pickup_time,
+                 latest_pickup_time, estimated_duration, set_number, path_offsets, path_nodes, nodes):
+        self.task_id = task_id
+        self.pickup_location = pickup_location
+        self.delivery_location = delivery_location
+        self.hard_constraints = hard_constraints
+        self.earliest_pickup_time = earliest_pickup_time
+        self.latest_pickup_time = latest_pickup_time
+        self.estimated_duration = estimated_duration
+        self.set_number = set_number
+        self.path_offsets = path_offsets
+        self.path_nodes = path_nodes
+        self.nodes = nodes
+
+    def __len__(self):
+        return len(self.task_id)
+
+    @classmethod
+    def from_dicts(cls, task_dicts):
+        """ Creates a TaskTable from an iterable of tasks in dict format
+
+        Tasks without temporal constraints get -1 as earliest and latest pickup time
+        """
+        node_index = dict()
+        path_nodes = list()
+        path_offsets = [0]
+        fields = {column: list() for column in cls.columns[:8]}
+
+        def get_index(pose):
+            return node_index.setdefault(pose, len(node_index))
+
+        for task in task_dicts:
+            fields['task_id'].append(task['task_id'])
+            fields['pickup_location'].append(get_index(task['pickup_location']))
+            fields['delivery_location'].append(get_index(task['delivery_location']))
+            fields['hard_constraints'].append(task['hard_constraints'])
+            fields['earliest_pickup_time'].append(_get_time(task['earliest_pickup_time']))
+            fields['latest_pickup_time'].append(_get_time(task['latest_pickup_time']))
+            fields['estimated_duration'].append(task['plan']['estimated_duration'])
+            fields['set_number'].append(task['set_number'])
+            path_nodes.extend(get_index(node) for node in task['plan']['path'])
+            path_offsets.append(len(path_nodes))
+
+        return cls(task_id=np.array(fields['task_id'], dtype=str),
+                   pickup_location=np.array(fields['pickup_location'], dtype=np.int32),
+                   delivery_location=np.array(fields['delivery_location'], dtype=np.int32),
+                   hard_constraints=np.array(fields['hard_constraints'], dtype=bool),
+                   earliest_pickup_time=np.array(fields['earliest_pickup_time'], dtype=np.int64),
+                   latest_pickup_time=np.array(fields['latest_pickup_time'], dtype=np.int64),
+                   estimated_duration=np.array(fields['estimated_duration'], dtype=np.int64),
+                   set_number=np.array(fields['set_number'], dtype=np.int64),
+                   path_offsets=np.array(path_offsets, dtype=np.int64),
+                   path_nodes=np.array(path_nodes, dtype=np.int32),
+                   nodes=np.array(sorted(node_index, key=node_index.get), dtype=str))
+
+    @classmethod
+    def from_tasks(cls, tasks):
+        return cls.from_dicts(task.to_dict() for task in tasks)
+
+    @classmethod
+    def from_columns(cls, columns):
+        """ Creates a TaskTable from a dict of arrays, e.g., the arrays of a .npz dataset. Arrays are not copied
+        """
+        return cls(**{column: columns[column] for column in cls.columns})
+
+    def to_columns(self):
+        return {column: getattr(self, column) for column in self.columns}
+
+    def replace(self, **columns):
+        """ Returns a TaskTable with the given arrays, e.g., replace(earliest_pickup_time=array).
+        The other arrays are shared with this TaskTable
+        """
+        return TaskTable(**dict(self.to_columns(), **columns))
+
+    def iter_dicts(self):
+        """ Yields the tasks in dict format
+        """
+        nodes = self.nodes.tolist()
+        path_nodes = self.path_nodes.tolist()
+        path_offsets = self.path_offsets.tolist()
+
+        fields = zip(self.task_id.tolist(), self.pickup_location.tolist(), self.delivery_location.tolist(),
+                     self.hard_constraints.tolist(), self.earliest_pickup_time.tolist(),
+                     self.latest_pickup_time.tolist(), self.estimated_duration.tolist(), self.set_number.tolist())
+
+        for i, (task_id, pickup, delivery, hard_constraints, ept, lpt, duration, set_number) in enumerate(fields):
+            path = [nodes[k] for k in path_nodes[path_offsets[i]:path_offsets[i+1]]]
+            yield {'task_id': task_id,
+                   'pickup_location': nodes[pickup],
+                   'delivery_location': nodes[delivery],
+                   'hard_constraints': hard_constraints,
+                   'earliest_pickup_time': None if ept == -1 else ept,
+                   'latest_pickup_time': None if lpt == -1 else lpt,
+                   'plan': {'path': path, 'estimated_duration': duration},
+                   'set_number': set_number}
+
+    def to_dict(self):
+        """ Returns the tasks in the format of dataset['tasks'], i.e., a dict of task dicts by task_id
+        """
+        return {task['task_id']: task for task in self.iter_dicts()}
+
+    def to_tasks(self, task_type='task'):
+        task_cls = task_factory.get_task_cls(task_type)
+        return [task_cls.from_dict(task_info) for task_info in self.iter_dicts()]
+
+    def get_path(self, i):
+        return self.nodes[self.path_nodes[self.path_offsets[i]:self.path_offsets[i+1]]].tolist()
+
+    def take(self, indices):
+        """ Returns a TaskTable with the tasks at the given indices (or boolean mask), in that order
+        The node table is shared with this TaskTable
+        """
+        indices = np.arange(len(self))[indices]
+        starts = self.path_offsets[indices]
+        lengths = self.path_offsets[indices + 1] - starts
+        path_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=path_offsets[1:])
+        # Index of each path node in self.path_nodes
+        node_positions = np.repeat(starts - path_offsets[:-1], lengths) + np.arange(path_offsets[-1])
+
+        return TaskTable(task_id=self.task_id[indices],
+                         pickup_location=self.pickup_location[indices],
+                         delivery_location=self.delivery_location[indices],
+                         hard_constraints=self.hard_constraints[indices],
+                         earliest_pickup_time=self.earliest_pickup_time[indices],
+                         latest_pickup_time=self.latest_pickup_time[indices],
+                         estimated_duration=self.estimated_duration[indices],
+                         set_number=self.set_number[indices],
+                         path_offsets=path_offsets,
+                         path_nodes=self.path_nodes[node_positions],
+                         nodes=self.nodes)
+
+
+def _get_time(time_):
+    return -1 if time_ is None else time_
@@ -0,0 +1,58 @@
+import argparse
+import os
+
+from dataset_lib.load_dataset import get_datasets_dir
+from dataset_lib.utils.datasets import load_yaml, expand_paths, store_as_npz, is_dataset
+
+
+def convert_to_npz(dataset_name, datasets_dir=None):
+    """ Stores the yaml dataset dataset_name as a .npz file in datasets_dir
+
+    :param dataset_name: name of the dataset
+    :param datasets_dir: directory of the dataset. If None, the datasets directory of the package is used
+    :return: the .npz file, or None if the yaml file is not a dataset, e.g., a shared node table
+    """
+    if datasets_dir is None:
+        datasets_dir = get_datasets_dir()
+    dataset = load_yaml(datasets_dir + dataset_name + '.yaml')
+    if not is_dataset(dataset):
+        return None
+    dataset = expand_paths(dataset, datasets_dir)
+    dataset_file = datasets_dir + dataset_name + '.npz'
+    store_as_npz(dataset, dataset_file, catalog=True)
+    return dataset_file
+
+
+def convert_datasets(dataset_names=None, datasets_dir=None):
+    """ Converts the yaml datasets dataset_names (all yaml datasets of datasets_dir if None) to .npz files.
+    Yaml files that are not datasets are skipped
+
+    :return: list of .npz files
+    """
+    if datasets_dir is None:
+        datasets_dir = get_datasets_dir()
+    if not dataset_names:
+        dataset_names = sorted(file_[:-len('.yaml')] for file_ in os.listdir(datasets_dir)
+                               if file_.endswith('.yaml'))
+
+    dataset_files = list()
+    for dataset_name in dataset_names:
+        dataset_file = convert_to_npz(dataset_name, datasets_dir)
+        if dataset_file is not None:
+            dataset_files.append(dataset_file)
+    return dataset_files
+
+
+if __name__ == '__main__':
+
+    "Converts yaml datasets to the columnar .npz format"
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('dataset_names', type=str, nargs='*', help='Names of the datasets to convert. '
+                        'If none is given, all yaml datasets in the datasets directory are converted')
+
+    args = parser.parse_args()
+
+    for dataset_file in convert_datasets(args.dataset_names):
+        print(dataset_file)
@@ -1,10 +1,10 @@
 import argparse
 import logging
 
-import yaml
 from dataset_lib.config.creators import DatasetCreator
 from dataset_lib.config.factories import DatasetMeta, Interval
-from dataset_lib.utils.datasets import get_dataset_name
+from dataset_lib.utils.datasets import get_dataset_name, store_as_yaml, JsonlWriter
+from dataset_lib.utils.stats import profile
 
 if __name__ == '__main__':
 
@@ -52,9 +52,27 @@ if __name__ == '__main__':
     parser.add_argument('--max_duration', type=int, help='Maximum duration (seconds) between pickup and delivery',
                         default=120)
 
+    parser.add_argument('--interned_paths', action='store_true', help='Store task paths as indices to a table '
+                        'of node names')
+
+    parser.add_argument('--seed', type=int, help='Seed of the random streams. A given seed always produces '
+                        'the same dataset', default=None)
+
+    parser.add_argument('--workers', type=int, help='Number of processes used to generate the overlapping sets',
+                        default=None)
+
+    parser.add_argument('--file_format', type=str, help='jsonl writes the tasks as they are created, '
+                        'without keeping the dataset in memory', choices=['yaml', 'jsonl'], default='yaml')
+
+    parser.add_argument('--profile', type=str, nargs='?', const='', default=None, metavar='PROFILE_FILE',
+                        help='Print the planner calls, cache hit rates and time per stage. If PROFILE_FILE is given, '
+                        'the cProfile output is dumped to it')
+
+    parser.add_argument('--log_level', type=str, choices=['DEBUG', 'INFO', 'WARNING'], default='DEBUG')
+
     args = parser.parse_args()
 
-    dataset_name = get_dataset_name(args.n_overlapping_sets, args.interval_type)
+    dataset_name = get_dataset_name(args.n_tasks, args.n_overlapping_sets, args.interval_type)
     dataset_type = dataset_name.split('_')[0]
     duration_range = list(range(args.min_duration, args.max_duration))
 
@@ -67,14 +85,19 @@ if __name__ == '__main__':
     dataset_meta = DatasetMeta(dataset_name, dataset_type, args.dataset_start_time, pickup_time_interval,
                                time_window_interval, args.map_sections)
 
-    dataset_creator = DatasetCreator(args.task_type, args.map_name, dataset_meta)
-
-    logging.basicConfig(level=logging.DEBUG)
+    logging.basicConfig(level=args.log_level)
 
-    dataset, tasks = dataset_creator.create(n_tasks=args.n_tasks, n_overlapping_sets=args.n_overlapping_sets,
-                                            duration_range=duration_range)
+    with profile(args.profile):
+        dataset_creator = DatasetCreator(args.task_type, args.map_name, dataset_meta, args.seed)
 
-    dataset_file = 'datasets/' + dataset_name + '.yaml'
+        if args.file_format == 'jsonl':
+            with JsonlWriter('datasets/' + dataset_name + '.jsonl', dataset_meta.to_dict(), catalog=True) as writer:
+                writer.write_tasks(dataset_creator.iter_tasks(n_tasks=args.n_tasks,
+                                                              n_overlapping_sets=args.n_overlapping_sets,
+                                                              duration_range=duration_range, workers=args.workers))
+        else:
+            dataset, tasks = dataset_creator.create(n_tasks=args.n_tasks, n_overlapping_sets=args.n_overlapping_sets,
+                                                    duration_range=duration_range, workers=args.workers)
 
-    with open(dataset_file, 'w') as outfile:
-        yaml.safe_dump(dataset, outfile, default_flow_style=False)
+            dataset_file = 'datasets/' + dataset_name + '.yaml'
+            store_as_yaml(dataset, dataset_file, args.interned_paths, catalog=True)
@@ -1,20 +1,37 @@
 import argparse
 import logging
 
-import yaml
 from dataset_lib.config.creators import DatasetCreator
 from dataset_lib.config.factories import Interval, DatasetMeta
-from dataset_lib.utils.datasets import get_dataset_name
+from dataset_lib.utils.datasets import get_dataset_name, store_as_yaml
+from dataset_lib.utils.stats import profile
 
 
 def create_datasets(n_tasks, n_overlapping_sets, dataset_start_time, pickup_time_boundaries, time_window_boundaries,
                     duration_range, **kwargs):
     """
     Creates a dataset with the same tasks for each interval type
+
+    kwargs:
+        dataset_names (dict): name of the dataset of each interval type. If None, the next free name is used
+        datasets_dir (str): directory where the datasets are stored
+        pose_creator (PoseCreator): pose creator to use instead of the one in the creator_registry
+        verbose (bool): print the name and type of each dataset
+        catalog (bool): record the datasets in the catalog of datasets_dir
+
+    :return: list of dataset files
     """
     map_name = kwargs.get('map_name', 'brsu')
     map_sections = kwargs.get('map_sections', ['square', 'street', 'faraway'])
     task_type = kwargs.get('task_type', 'task')
+    interned_paths = kwargs.get('interned_paths', False)
+    seed = kwargs.get('seed')
+    workers = kwargs.get('workers')
+    dataset_names = kwargs.get('dataset_names')
+    datasets_dir = kwargs.get('datasets_dir', 'datasets/')
+    pose_creator = kwargs.get('pose_creator')
+    verbose = kwargs.get('verbose', True)
+    catalog = kwargs.get('catalog', False)
 
     time_window_interval_types = ['tight', 'loose', 'random']
 
@@ -22,33 +39,39 @@ def create_datasets(n_tasks, n_overlapping_sets, dataset_start_time, pickup_time
     pickup_time_interval = Interval('tight', pickup_time_boundaries[0], pickup_time_boundaries[1])
 
     tasks = dict()
+    dataset_files = list()
 
     for interval_type in time_window_interval_types:
-        print("TW Interval type: ", interval_type)
-        dataset_name = get_dataset_name(n_tasks, n_overlapping_sets, interval_type)
+        if dataset_names:
+            dataset_name = dataset_names[interval_type]
+        else:
+            dataset_name = get_dataset_name(n_tasks, n_overlapping_sets, interval_type)
         dataset_type = dataset_name.split('_')[0]
 
-        print("dataset_name: ", dataset_name)
-        print("dataset_type: ", dataset_type)
+        if verbose:
+            print("TW Interval type: ", interval_type)
+            print("dataset_name: ", dataset_name)
+            print("dataset_type: ", dataset_type)
 
         time_window_interval = Interval(interval_type, time_window_boundaries[0], time_window_boundaries[1])
 
         dataset_meta = DatasetMeta(dataset_name, dataset_type, dataset_start_time, pickup_time_interval,
                                    time_window_interval, map_sections)
 
-        dataset_creator = DatasetCreator(task_type, map_name, dataset_meta)
+        dataset_creator = DatasetCreator(task_type, map_name, dataset_meta, seed, pose_creator=pose_creator)
 
         if not tasks:
             dataset, tasks = dataset_creator.create(n_tasks=n_tasks, n_overlapping_sets=n_overlapping_sets,
-                                                    duration_range=duration_range)
+                                                    duration_range=duration_range, workers=workers)
         else:
             dataset, tasks = dataset_creator.create(n_tasks=n_tasks, n_overlapping_sets=n_overlapping_sets, tasks=tasks,
                                                     duration_range=duration_range)
 
-        dataset_file = 'datasets/' + dataset_name + '.yaml'
+        dataset_file = datasets_dir + dataset_name + '.yaml'
+        store_as_yaml(dataset, dataset_file, interned_paths, catalog=catalog)
+        dataset_files.append(dataset_file)
 
-        with open(dataset_file, 'w') as outfile:
-            yaml.safe_dump(dataset, outfile, default_flow_style=False)
+    return dataset_files
 
 
 if __name__ == '__main__':
@@ -86,6 +109,21 @@ if __name__ == '__main__':
     parser.add_argument('--max_duration', type=int, help='Maximum duration (seconds) between pickup and delivery',
                         default=120)
 
+    parser.add_argument('--interned_paths', action='store_true', help='Store task paths as indices to a table '
+                        'of node names')
+
+    parser.add_argument('--seed', type=int, help='Seed of the random streams. A given seed always produces '
+                        'the same dataset', default=None)
+
+    parser.add_argument('--workers', type=int, help='Number of processes used to generate the overlapping sets',
+                        default=None)
+
+    parser.add_argument('--profile', type=str, nargs='?', const='', default=None, metavar='PROFILE_FILE',
+                        help='Print the planner calls, cache hit rates and time per stage. If PROFILE_FILE is given, '
+                        'the cProfile output is dumped to it')
+
+    parser.add_argument('--log_level', type=str, choices=['DEBUG', 'INFO', 'WARNING'], default='DEBUG')
+
     args = parser.parse_args()
 
     duration_range = list(range(args.min_duration, args.max_duration+1))
@@ -94,7 +132,9 @@ if __name__ == '__main__':
 
     time_window_boundaries = [args.time_window_lower_bound, args.time_window_upper_bound]
 
-    logging.basicConfig(level=logging.DEBUG)
+    logging.basicConfig(level=args.log_level)
 
-    create_datasets(args.n_tasks, args.n_overlapping_sets, args.dataset_start_time, pickup_time_boundaries,
-                    time_window_boundaries, duration_range)
+    with profile(args.profile):
+        create_datasets(args.n_tasks, args.n_overlapping_sets, args.dataset_start_time, pickup_time_boundaries,
+                        time_window_boundaries, duration_range, interned_paths=args.interned_paths, seed=args.seed,
+                        workers=args.workers, catalog=True)
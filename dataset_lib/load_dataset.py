@@ -1,9 +1,11 @@
 import csv
 import os
-from dataset_lib.utils.datasets import load_yaml
+from dataset_lib.utils.datasets import load_yaml, load_yaml_cached, expand_paths, load_npz, load_jsonl_metadata, \
+    iter_jsonl, is_dataset
 from dataset_lib.config.factories import task_factory
+from dataset_lib.config.dataset_view import DatasetView
+from dataset_lib.utils.stats import stats, profile
 import argparse
-import collections
 
 
 def get_datasets_dir():
@@ -13,39 +15,103 @@ def get_datasets_dir():
     return datasets_dir
 
 
-def load_yaml_dataset(dataset_name, task_type):
+def load_yaml_dataset(dataset_name, task_type, cache=True, datasets_dir=None):
+    """ Loads a yaml dataset and returns a DatasetView. If cache is True, the parsed file is cached in
+    datasets/.cache/ and reused until the file changes
 
-    datasets_dir = get_datasets_dir()
+    datasets_dir: directory of the dataset. If None, the datasets directory of the package is used
+    """
+    if datasets_dir is None:
+        datasets_dir = get_datasets_dir()
     dataset_path = datasets_dir + dataset_name + '.yaml'
-    dataset_dict = load_yaml(dataset_path)
+    with stats.timer('load_yaml_dataset'):
+        if cache:
+            dataset_dict = expand_paths(load_yaml_cached(dataset_path), datasets_dir)
+        else:
+            dataset_dict = expand_paths(load_yaml(dataset_path), datasets_dir)
 
-    task_cls = task_factory.get_task_cls(task_type)
+        return DatasetView.from_dict(dataset_dict, task_type)
 
-    tasks = list()
-    tasks_dict = dataset_dict.get('tasks')
-    ordered_tasks = collections.OrderedDict(sorted(tasks_dict.items()))
 
-    for task_id, task_info in ordered_tasks.items():
-        task = task_cls.from_dict(task_info)
-        tasks.append(task)
+def load_npz_columns(dataset_name, mmap_mode='r'):
+    """ Returns the arrays of a dataset stored with store_as_npz. By default, the arrays are memory-mapped
+    """
+    dataset_path = get_datasets_dir() + dataset_name + '.npz'
+    return load_npz(dataset_path, mmap_mode)
 
-    dataset_dict['tasks'] = tasks
 
-    return dataset_dict
+def load_npz_dataset(dataset_name, task_type, mmap_mode='r'):
+    """ Loads a .npz dataset and returns a DatasetView. The time window arrays of the view are memory-mapped
+    """
+    with stats.timer('load_npz_dataset'):
+        return DatasetView.from_columns(load_npz_columns(dataset_name, mmap_mode), task_type)
 
 
-def load_dataset(dataset_name, dataset_type, task_type, interval_type, file_extension):
+def iter_tasks(dataset_name, task_type=None):
+    """ Yields the tasks of a dataset stored in the JSON Lines format (see JsonlWriter), one at a time,
+    so that the whole dataset is never in memory
+
+    :param dataset_name: name of the dataset
+    :param task_type: if given, Task objects of task_type are yielded instead of dicts
+    """
+    tasks = iter_jsonl(get_datasets_dir() + dataset_name + '.jsonl')
+    if task_type is None:
+        yield from tasks
+    else:
+        task_cls = task_factory.get_task_cls(task_type)
+        for task_info in tasks:
+            yield task_cls.from_dict(task_info)
+
+
+def load_jsonl_dataset(dataset_name, task_type):
+    """ Loads a dataset stored in the JSON Lines format and returns a DatasetView
+    """
+    with stats.timer('load_jsonl_dataset'):
+        metadata = load_jsonl_metadata(get_datasets_dir() + dataset_name + '.jsonl')
+        task_dicts = sorted(iter_tasks(dataset_name), key=lambda task: task['task_id'])
+        return DatasetView(metadata, task_type, task_dicts=task_dicts)
 
-    path = get_path_to_dataset(dataset_type, task_type, interval_type)
+
+def load_dataset_file(dataset_file, task_type):
+    """ Loads a dataset file in any of the formats of load_dataset (by its extension) and returns a DatasetView
+    """
+    file_extension = os.path.splitext(dataset_file)[1][1:]
 
     if file_extension == 'yaml':
+        dataset_dir = os.path.dirname(dataset_file)
+        dataset_dict = load_yaml_cached(dataset_file)
+        if not is_dataset(dataset_dict):
+            raise ValueError("%s is not a dataset" % dataset_file)
+        return DatasetView.from_dict(expand_paths(dataset_dict, dataset_dir), task_type)
+
+    elif file_extension == 'npz':
+        return DatasetView.from_columns(load_npz(dataset_file), task_type)
+
+    elif file_extension == 'jsonl':
+        task_dicts = sorted(iter_jsonl(dataset_file), key=lambda task: task['task_id'])
+        return DatasetView(load_jsonl_metadata(dataset_file), task_type, task_dicts=task_dicts)
 
-        tasks = load_yaml_dataset(dataset_name, task_type, path)
+    raise ValueError(file_extension)
+
+
+def load_dataset(dataset_name, dataset_type, task_type, interval_type, file_extension):
+
+    if file_extension == 'yaml':
+
+        dataset = load_yaml_dataset(dataset_name, task_type)
+
+    elif file_extension == 'npz':
+
+        dataset = load_npz_dataset(dataset_name, task_type)
+
+    elif file_extension == 'jsonl':
+
+        dataset = load_jsonl_dataset(dataset_name, task_type)
 
     else:
         raise ValueError(file_extension)
 
-    return tasks
+    return dataset
 
 
 def get_path_to_dataset(dataset_type, task_type, interval_type):
@@ -73,15 +139,20 @@ if __name__ == '__main__':
                         choices=['tight', 'loose', 'random'])
 
     parser.add_argument('--file_extension', type=str, help='File extension',
-                        choices=['csv', 'yaml'],
+                        choices=['csv', 'yaml', 'npz', 'jsonl'],
                         default='yaml')
 
+    parser.add_argument('--profile', type=str, nargs='?', const='', default=None, metavar='PROFILE_FILE',
+                        help='Print the cache hit rates and load time. If PROFILE_FILE is given, the cProfile '
+                        'output is dumped to it')
+
     args = parser.parse_args()
 
-    tasks = load_dataset(args.dataset_name, args.dataset_type, args.task_type, args.interval_type,
-                         args.file_extension)
+    with profile(args.profile):
+        dataset = load_dataset(args.dataset_name, args.dataset_type, args.task_type, args.interval_type,
+                               args.file_extension)
 
-    for task in tasks:
+    for task in dataset['tasks']:
         print(task.task_id)
         print(task.pickup_location)
 
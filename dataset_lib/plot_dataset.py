@@ -7,11 +7,17 @@ from datetime import timedelta
 import dateutil.parser
 import matplotlib.dates as mdate
 import matplotlib.pyplot as plt
+import numpy as np
+import plotly.graph_objects as go
 from colour import Color
 from dataset_lib.load_dataset import load_yaml_dataset
-from matplotlib.patches import Rectangle
 from plotly import figure_factory as ff
 
+# Datasets with more tasks are drawn with one trace per set number instead of a gantt chart
+MAX_GANTT_TASKS = 500
+# Datasets with more tasks are drawn as the number of time windows per set number and time bin
+MAX_SEGMENT_TASKS = 20000
+
 
 def get_random_color():
     return "#%06x" % random.randint(0, 0xFFFFFF)
@@ -33,11 +39,35 @@ def get_colors(gantt_tasks):
     return {task.get('Resource'): colors[i] for i, task in enumerate(gantt_tasks)}
 
 
-def plot_gantt(title, schedule, colors, group_tasks=True, borders=False, **kwargs):
+def write_figure(fig, file_name, **kwargs):
+    """ Writes the figure as html and, optionally, as png
+
+    kwargs:
+        dir (str): directory of the plots
+        show (bool): if True, the figure is shown
+        write_image (bool): if False, the png is not written, e.g., to export it later in a batch
+        include_plotlyjs: see plotly's write_html. With 'directory', the html files of a directory share one
+        plotly.min.js file instead of embedding it
+    """
     directory = kwargs.get('dir', 'datasets/plots/')
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    if kwargs.get('write_image', True):
+        fig.write_image(directory + '/%s.png' % file_name)
+    fig.write_html(directory + '/%s.html' % file_name, include_plotlyjs=kwargs.get('include_plotlyjs', True))
+    if kwargs.get('show'):
+        fig.show()
+
+
+def plot_gantt(title, schedule, colors, group_tasks=True, borders=False, **kwargs):
+    """ Creates a gantt chart of the schedule and writes it with write_figure
+
+    :return: plotly figure
+    """
     xmin = kwargs.get('xmin')
     xmax = kwargs.get('xmax')
-    show = kwargs.get('show')
     file_name = kwargs.get('file_name', title)
 
     fig = ff.create_gantt(schedule, title="Dataset: " + title, group_tasks=group_tasks, showgrid_x=True,
@@ -49,13 +79,113 @@ def plot_gantt(title, schedule, colors, group_tasks=True, borders=False, **kwarg
     if xmin and xmax:
         fig.layout.xaxis.update(range=[xmin, xmax])
 
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+    write_figure(fig, file_name, **kwargs)
 
-    fig.write_image(directory + '/%s.png' % file_name)
-    fig.write_html(directory + '/%s.html' % file_name)
-    if show:
-        fig.show()
+    return fig
+
+
+def get_time_windows(tasks):
+    """ Returns the earliest start time, latest finish time and set number of the tasks as numpy arrays
+    Times are relative to the dataset initial time
+
+    :param tasks: list of Tasks or DatasetView
+    :return: start_times, finish_times, set_numbers
+    """
+    if hasattr(tasks, 'estimated_duration'):
+        # DatasetView, uses the arrays without creating Task objects
+        return (np.asarray(tasks.earliest_pickup_time), np.asarray(tasks.latest_pickup_time +
+                                                                   tasks.estimated_duration),
+                np.asarray(tasks.set_number))
+
+    start_times = np.fromiter((task.earliest_pickup_time for task in tasks), dtype=np.int64, count=len(tasks))
+    finish_times = np.fromiter((task.latest_pickup_time + task.plan.estimated_duration for task in tasks),
+                               dtype=np.int64, count=len(tasks))
+    set_numbers = np.fromiter((task.set_number for task in tasks), dtype=np.int64, count=len(tasks))
+    return start_times, finish_times, set_numbers
+
+
+def to_datetimes(times, initial_time):
+    """ Converts times (seconds) relative to initial_time (timestamp) to an array of datetime64
+    """
+    return np.datetime64(datetime.fromtimestamp(initial_time), 'ms') + \
+        np.round(np.asarray(times) * 1000).astype('timedelta64[ms]')
+
+
+def get_time_window_segments(start_times, finish_times, initial_time):
+    """ Returns the x values of a line trace that draws each time window as a segment
+    Segments are separated by None
+
+    :return: numpy array of objects (iso time strings and None)
+    """
+    x = np.full(3 * len(start_times), None, dtype=object)
+    x[0::3] = np.datetime_as_string(to_datetimes(start_times, initial_time))
+    x[1::3] = np.datetime_as_string(to_datetimes(finish_times, initial_time))
+    return x
+
+
+def get_occupancy(start_times, finish_times, set_numbers, n_bins):
+    """ Returns the number of time windows of each set number that overlap each time bin
+
+    :return: bin edges (n_bins + 1), set numbers (n_sets), occupancy (n_sets x n_bins)
+    """
+    bin_edges = np.linspace(start_times.min(), finish_times.max(), n_bins + 1)
+    sets, set_indices = np.unique(set_numbers, return_inverse=True)
+
+    first_bins = np.clip(np.searchsorted(bin_edges, start_times, side='right') - 1, 0, n_bins - 1)
+    last_bins = np.clip(np.searchsorted(bin_edges, finish_times, side='left') - 1, 0, n_bins - 1)
+    last_bins = np.maximum(first_bins, last_bins)
+
+    # +1 at the first bin and -1 after the last bin of each time window
+    changes = np.zeros((len(sets), n_bins + 1), dtype=np.int64)
+    np.add.at(changes, (set_indices, first_bins), 1)
+    np.add.at(changes, (set_indices, last_bins + 1), -1)
+
+    return bin_edges, sets, np.cumsum(changes, axis=1)[:, :-1]
+
+
+def plot_time_windows(title, start_times, finish_times, set_numbers, initial_time, **kwargs):
+    """ Draws the time windows of the tasks in a number of traces that does not depend on the number of tasks
+
+    Up to max_segment_tasks tasks, the time windows of each set number are drawn as segments of a single WebGL
+    trace. Above, the number of time windows per set number and time bin (n_bins) is drawn as a heatmap
+
+    :param initial_time: timestamp to which the times are referenced
+    :return: plotly figure
+    """
+    xmin = kwargs.get('xmin')
+    xmax = kwargs.get('xmax')
+    file_name = kwargs.get('file_name', title)
+    max_segment_tasks = kwargs.get('max_segment_tasks', MAX_SEGMENT_TASKS)
+
+    fig = go.Figure()
+
+    if len(start_times) <= max_segment_tasks:
+        sets = np.unique(set_numbers)
+        colors = get_gradient_color(len(sets))
+        for set_number, color in zip(sets.tolist(), colors):
+            in_set = set_numbers == set_number
+            x = get_time_window_segments(start_times[in_set], finish_times[in_set], initial_time)
+            y = np.full(len(x), None, dtype=object)
+            y[0::3] = set_number
+            y[1::3] = set_number
+            fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', line=dict(color=color, width=10),
+                                       name=str(set_number), hoverinfo='x+y'))
+    else:
+        bin_edges, sets, occupancy = get_occupancy(start_times, finish_times, set_numbers,
+                                                   kwargs.get('n_bins', 1000))
+        bin_centers = np.datetime_as_string(to_datetimes((bin_edges[:-1] + bin_edges[1:]) / 2, initial_time))
+        fig.add_trace(go.Heatmap(x=bin_centers, y=sets, z=occupancy, colorscale='Blues',
+                                 colorbar=dict(title='Tasks')))
+
+    fig.update_layout(title="Dataset: " + title, showlegend=False, xaxis=dict(showgrid=True),
+                      yaxis=dict(title='Task set number', autorange='reversed'))
+
+    if xmin and xmax:
+        fig.layout.xaxis.update(range=[xmin, xmax])
+
+    write_figure(fig, file_name, **kwargs)
+
+    return fig
 
 
 def get_gantt_task(task_id, pickup_time, delivery_time, set_number):
@@ -68,17 +198,37 @@ def plot_dataset_plotly(dataset_name, tasks, initial_time, show=False, **kwargs)
     """
     Args:
         dataset_name (str) name of dataset
-        tasks (list) of Tasks
+        tasks (list) of Tasks or DatasetView
         initial_time (iso_time): Initial time to which tasks are referenced to
         e.g. "2020-01-23T08:00:00.000000"
 
+    kwargs are passed to plot_gantt or plot_time_windows
+        mode (str): 'gantt', 'time_windows' or 'auto'. With 'auto', datasets with more than max_gantt_tasks tasks
+        are plotted with plot_time_windows
+
+    Returns the plotly figure
     """
-    file_name = kwargs.get('file_name')
-    gantt_tasks = list()
+    mode = kwargs.pop('mode', 'auto')
+    if not kwargs.get('file_name'):
+        kwargs.pop('file_name', None)
     initial_time = dateutil.parser.parse(initial_time).timestamp()
-    earliest_time = float('inf')
-    latest_time = - float('inf')
 
+    start_times, finish_times, set_numbers = get_time_windows(tasks)
+
+    kwargs.setdefault('xmin', datetime.fromtimestamp(start_times.min() + initial_time) - timedelta(seconds=60))
+    kwargs.setdefault('xmax', datetime.fromtimestamp(finish_times.max() + initial_time) + timedelta(seconds=60))
+    kwargs['show'] = show
+
+    if mode == 'auto':
+        mode = 'gantt' if len(start_times) <= kwargs.get('max_gantt_tasks', MAX_GANTT_TASKS) else 'time_windows'
+
+    if mode == 'time_windows':
+        return plot_time_windows(dataset_name, start_times, finish_times, set_numbers, initial_time, **kwargs)
+
+    if hasattr(tasks, 'estimated_duration'):
+        tasks = tasks.tasks
+
+    gantt_tasks = list()
     for task in tasks:
         pickup_time = task.earliest_pickup_time + initial_time
         delivery_time = task.latest_pickup_time + initial_time + task.plan.estimated_duration
@@ -87,71 +237,67 @@ def plot_dataset_plotly(dataset_name, tasks, initial_time, show=False, **kwargs)
                                       datetime.fromtimestamp(delivery_time),
                                       task.set_number)
 
-        if pickup_time < earliest_time:
-            earliest_time = pickup_time
-
-        if delivery_time > latest_time:
-            latest_time = delivery_time
-
-    xmin = kwargs.get('xmin', datetime.fromtimestamp(earliest_time) - timedelta(seconds=60))
-    xmax = kwargs.get('xmax', datetime.fromtimestamp(latest_time) + timedelta(seconds=60))
-
-    kwargs = {"xmin": xmin, "xmax": xmax, "show": show}
-    if file_name:
-        kwargs.update(file_name=file_name)
-
     colors = get_colors(gantt_tasks)
 
-    plot_gantt(dataset_name, gantt_tasks, colors, **kwargs)
-
+    return plot_gantt(dataset_name, gantt_tasks, colors, **kwargs)
 
-def plot_dataset_plt(dataset_name, tasks, initial_time, show=False, **kwargs):
-    directory = kwargs.get('dir', 'datasets/plots/')
-    fig = plt.figure()
-    ax = fig.add_subplot(111)
 
-    dataset_start_time = float('inf')
-    dataset_finish_time = - float('inf')
-    highest_set_number = 0
-    earliest_task = None
+def get_task_ids(tasks):
+    """ Returns the task ids of a list of Tasks or of a DatasetView
+    """
+    if hasattr(tasks, 'get_task_dicts'):
+        return [task['task_id'] for task in tasks.get_task_dicts()]
+    return [str(task.task_id) for task in tasks]
 
-    start_time = dateutil.parser.parse(initial_time).timestamp()
 
-    for task in tasks:
-        earliest_start_time = task.earliest_pickup_time + start_time
-        latest_finish_time = task.latest_pickup_time + task.plan.estimated_duration + start_time
+def plot_dataset_plt(dataset_name, tasks, initial_time, show=False, **kwargs):
+    """ Draws the time windows of the tasks with one broken_barh per set number and stores the figure as png
 
-        if task.set_number > highest_set_number:
-            highest_set_number = task.set_number
+    Args:
+        dataset_name (str) name of dataset
+        tasks (list) of Tasks or DatasetView
+        initial_time (iso_time): Initial time to which tasks are referenced to
 
-        if earliest_start_time < dataset_start_time:
-            dataset_start_time = earliest_start_time
-            earliest_task = task
+    kwargs:
+        output_file (str): path of the png. Default: <dir>/<dataset_name>.png
+        dir (str): directory of the plots
+        max_labels (int): the time windows are labeled with the first characters of the task id only if the
+        dataset has at most max_labels tasks
+        min_label_width (float): fraction of the x range a time window must cover to be labeled
 
-        if latest_finish_time > dataset_finish_time:
-            dataset_finish_time = latest_finish_time
+    Returns the matplotlib figure
+    """
+    directory = kwargs.get('dir', 'datasets/plots/')
+    output_file = kwargs.get('output_file', os.path.join(directory, dataset_name + '.png'))
+    max_labels = kwargs.get('max_labels', 100)
+    min_label_width = kwargs.get('min_label_width', 0.01)
 
-        # Convert form epoch to datetime object
-        start_window = datetime.fromtimestamp(earliest_start_time)
-        end_window = datetime.fromtimestamp(latest_finish_time)
+    start_times, finish_times, set_numbers = get_time_windows(tasks)
+    initial_time = dateutil.parser.parse(initial_time).timestamp()
 
-        # convert to matplotlib date representation
-        start_rectangle = mdate.date2num(start_window)
-        end_rectangle = mdate.date2num(end_window)
-        width_rectangle = end_rectangle - start_rectangle
+    # matplotlib date representation (days)
+    start_rectangles = mdate.date2num(to_datetimes(start_times, initial_time))
+    width_rectangles = (finish_times - start_times) / 86400
 
-        rect = Rectangle((start_rectangle, task.set_number), width_rectangle, 0.2, color='blue')
-        ax.add_patch(rect)
+    fig = plt.figure()
+    ax = fig.add_subplot(111)
 
-        rx, ry = rect.get_xy()
-        cx = rx + rect.get_width() / 2.0
-        cy = ry + rect.get_height() / 2.0
+    for set_number in np.unique(set_numbers).tolist():
+        in_set = set_numbers == set_number
+        ax.broken_barh(np.column_stack((start_rectangles[in_set], width_rectangles[in_set])), (set_number, 0.2),
+                       facecolors='blue')
 
-        ax.annotate(task.task_id[:3], (cx, cy), color='w', weight='bold',
-                    fontsize=6, ha='center', va='center')
+    start_time = start_rectangles.min()
+    finish_time = (start_rectangles + width_rectangles).max()
+    margin = 60 / 86400
 
-    start_time = mdate.date2num(datetime.fromtimestamp(dataset_start_time))
-    finish_time = mdate.date2num(datetime.fromtimestamp(dataset_finish_time))
+    if len(start_times) <= max_labels:
+        task_ids = get_task_ids(tasks)
+        # Only windows wide enough to fit the label are labeled
+        labeled = np.flatnonzero(width_rectangles >= min_label_width * (finish_time - start_time))
+        for i in labeled.tolist():
+            ax.text(start_rectangles[i] + width_rectangles[i] / 2, set_numbers[i] + 0.1, task_ids[i][:3],
+                    color='w', weight='bold', fontsize=6, ha='center', va='center')
 
     date_fmt = '%H:%M:%S'
     # Use a DateFormatter to set the data to the correct format.
@@ -161,22 +307,25 @@ def plot_dataset_plt(dataset_name, tasks, initial_time, show=False, **kwargs):
     # Sets the tick labels diagonal so they fit easier.
     fig.autofmt_xdate()
     # set the limits
-    plt.xlim([start_time - width_rectangle, finish_time + width_rectangle])
-    plt.ylim([0, highest_set_number + 1])
-
-    plt.xlabel("Time (hours:minutes:seconds)")
-    plt.ylabel("Task set number")
-    plt.title("Dataset: " + dataset_name)
+    ax.set_xlim([start_time - margin, finish_time + margin])
+    ax.set_ylim([0, set_numbers.max() + 1])
 
-    print("Earliest task: ", earliest_task.task_id)
+    ax.set_xlabel("Time (hours:minutes:seconds)")
+    ax.set_ylabel("Task set number")
+    ax.set_title("Dataset: " + dataset_name)
+    ax.grid()
 
-    plt.draw()
-    plt.grid()
+    output_dir = os.path.dirname(output_file)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    fig.savefig(output_file)
 
     if show:
         plt.show()
+    else:
+        plt.close(fig)
 
-    fig.savefig(directory + args.dataset_name + '.png')
+    return fig
 
 
 if __name__ == '__main__':
@@ -193,8 +342,8 @@ if __name__ == '__main__':
 
     dataset = load_yaml_dataset(args.dataset_name, args.task_type)
 
-    plot_dataset_plotly(args.dataset_name, dataset['tasks'], initial_time, show=True)
-    # plot_dataset_plt(args.dataset_name, dataset['tasks'], initial_time)
+    plot_dataset_plotly(args.dataset_name, dataset, initial_time, show=True)
+    # plot_dataset_plt(args.dataset_name, dataset, initial_time)
 
 
 
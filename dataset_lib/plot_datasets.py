@@ -1,49 +1,130 @@
-from dataset_lib.load_dataset import load_yaml_dataset
-import dateutil.parser
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
+import dateutil.parser
+from dataset_lib.load_dataset import load_yaml_dataset
 from dataset_lib.plot_dataset import plot_dataset_plotly
 
-if __name__ == '__main__':
+EXPERIMENTS = {'exp_1': ['overlapping_tight_25_5_1', 'overlapping_loose_25_5_1', 'overlapping_random_25_5_1'],
+               'exp_3': ['overlapping_random_5_5_1', 'overlapping_random_10_5_1', 'overlapping_random_15_5_1',
+                         'overlapping_random_20_5_1', 'overlapping_random_25_5_1'],
+               'exp_4': ['nonoverlapping_random_25_1']
+               }
 
-    # Uses the same initial time for all datasets
-    initial_time_str = "2020-01-23T08:00:00.000000"
-    initial_time = dateutil.parser.parse(initial_time_str).timestamp()
 
-    experiments = {'exp_1': ['overlapping_tight_25_5_1', 'overlapping_loose_25_5_1', 'overlapping_random_25_5_1'],
-                   'exp_3': ['overlapping_random_5_5_1', 'overlapping_random_10_5_1', 'overlapping_random_15_5_1',
-                             'overlapping_random_20_5_1', 'overlapping_random_25_5_1'],
-                   'exp_4': ['nonoverlapping_random_25_1']
-                   }
+def get_time_range(datasets, initial_time):
+    """ Returns the xmin and xmax (datetime) shared by the plots of the datasets
 
-    for experiment_name, datasets in experiments.items():
-        print("Experiment: ", experiment_name)
-        earliest_time = float('inf')
-        latest_time = - float('inf')
+    :param datasets: list of DatasetViews
+    :param initial_time: timestamp to which the tasks are referenced
+    :return: xmin, xmax
+    """
+    earliest_time = float('inf')
+    latest_time = - float('inf')
+
+    for dataset in datasets:
+        # Uses the time window arrays, without creating Task objects
+        pickup_time = dataset.earliest_pickup_time.min() + initial_time
+        delivery_time = (dataset.latest_pickup_time + dataset.estimated_duration).max() + initial_time
+
+        earliest_time = min(earliest_time, pickup_time)
+        latest_time = max(latest_time, delivery_time)
+
+    xmin = datetime.fromtimestamp(earliest_time) - timedelta(seconds=60)
+    xmax = datetime.fromtimestamp(latest_time) + timedelta(seconds=60)
+    return xmin, xmax
+
+
+def _write_images(figures, image_files):
+    # All figures of a worker are exported by the same export process
+    import plotly.io as pio
+
+    if hasattr(pio, 'write_images'):
+        pio.write_images(figures, image_files)
+    else:
+        # Older versions of plotly keep the kaleido process of this worker alive between calls
+        for fig, image_file in zip(figures, image_files):
+            pio.write_image(fig, image_file)
+    return image_files
+
+
+def write_images(figures, image_files, workers=None):
+    """ Exports the figures as images in a pool of processes. Each process exports a chunk of the figures
+
+    :param figures: list of plotly figures (or figure dicts)
+    :param image_files: list of paths, one per figure
+    :param workers: number of processes. If None, os.cpu_count() is used
+    """
+    if not figures:
+        return
+    workers = min(workers or os.cpu_count(), len(figures))
+    figures = [fig if isinstance(fig, dict) else fig.to_dict() for fig in figures]
 
-        for dataset_name in datasets:
-            print("Dataset: ", dataset_name)
-            dataset = load_yaml_dataset(dataset_name, 'task')
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_write_images, figures[i::workers], image_files[i::workers])
+                   for i in range(workers)]
+        for future in futures:
+            future.result()
 
-            for task in dataset.get('tasks'):
-                pickup_time = task.earliest_pickup_time + initial_time
-                delivery_time = task.latest_pickup_time + initial_time + task.plan.estimated_duration
-                if pickup_time < earliest_time:
-                    earliest_time = pickup_time
 
-                if delivery_time > latest_time:
-                    latest_time = delivery_time
+def plot_experiments(experiments, initial_time_str, directory='datasets/plots/', workers=None, show=False):
+    """ Plots the datasets of each experiment with the same xmin and xmax
 
-        xmin = datetime.fromtimestamp(earliest_time) - timedelta(seconds=60)
-        xmax = datetime.fromtimestamp(latest_time) + timedelta(seconds=60)
+    Each dataset is loaded once. The html files reference the plotly.min.js file of the directory and the png
+    files are exported in a pool of processes
+
+    :param experiments: dict of experiment name to list of dataset names
+    :param initial_time_str: iso time to which the tasks are referenced, e.g. "2020-01-23T08:00:00.000000"
+    :param directory: directory of the plots
+    :param workers: number of processes that export the png files
+    :param show: if True, the figures are shown
+    :return: list of image files
+    """
+    initial_time = dateutil.parser.parse(initial_time_str).timestamp()
+    loaded_datasets = dict()
+    figures = list()
+    image_files = list()
+
+    for experiment_name, dataset_names in experiments.items():
+        print("Experiment: ", experiment_name)
+
+        for dataset_name in dataset_names:
+            if dataset_name not in loaded_datasets:
+                print("Dataset: ", dataset_name)
+                loaded_datasets[dataset_name] = load_yaml_dataset(dataset_name, 'task')
+
+        xmin, xmax = get_time_range([loaded_datasets[dataset_name] for dataset_name in dataset_names], initial_time)
 
         print("xmin: ", xmin)
         print("xmax: ", xmax)
 
-        # Plot datasets from an experiment with the same xmin and xmax
+        for dataset_name in dataset_names:
+            file_name = experiment_name + '_' + dataset_name
+            fig = plot_dataset_plotly(dataset_name, loaded_datasets[dataset_name], initial_time_str,
+                                      show=show, xmin=xmin, xmax=xmax, file_name=file_name, dir=directory,
+                                      write_image=False, include_plotlyjs='directory')
+            figures.append(fig)
+            image_files.append(os.path.join(directory, file_name + '.png'))
+
+    write_images(figures, image_files, workers)
+    return image_files
 
-        for dataset_name in datasets:
-            dataset = load_yaml_dataset(dataset_name, 'task')
-            plot_dataset_plotly(dataset_name, dataset['tasks'], initial_time_str, show=True, xmin=xmin, xmax=xmax,
-                                file_name=experiment_name + '_' + dataset_name)
 
+if __name__ == '__main__':
+
+    "Plots the datasets of the experiments"
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--workers', type=int, help='Number of processes that export the png files', default=None)
+
+    parser.add_argument('--show', action='store_true', help='Show the figures')
+
+    args = parser.parse_args()
+
+    # Uses the same initial time for all datasets
+    initial_time_str = "2020-01-23T08:00:00.000000"
+
+    plot_experiments(EXPERIMENTS, initial_time_str, workers=args.workers, show=args.show)
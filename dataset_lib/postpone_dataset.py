@@ -1,6 +1,6 @@
 import argparse
 from dataset_lib.load_dataset import load_yaml_dataset
-import yaml
+from dataset_lib.utils.datasets import store_as_yaml
 
 
 def postpone_tasks(tasks, time_):
@@ -24,6 +24,9 @@ if __name__ == '__main__':
 
     parser.add_argument('--task_type', type=str, help='Task type', choices=['task'], default='task')
 
+    parser.add_argument('--interned_paths', action='store_true', help='Store task paths as indices to a table '
+                        'of node names')
+
     args = parser.parse_args()
 
     dataset = load_yaml_dataset(args.dataset_name, args.task_type)
@@ -34,8 +37,6 @@ if __name__ == '__main__':
 
     dataset_file = 'datasets/' + args.dataset_name + '_1.yaml'
     print(dataset_file)
-
-    with open(dataset_file, 'w') as outfile:
-        yaml.safe_dump(dataset, outfile, default_flow_style=False)
+    store_as_yaml(dataset.to_dict(), dataset_file, args.interned_paths)
 
 
@@ -0,0 +1,31 @@
+import argparse
+
+from dataset_lib.config.duration_matrix import DurationMatrix, get_duration_matrix_path, get_map_hash
+from dataset_lib.config.planners import planner_factory
+
+if __name__ == '__main__':
+
+    "Precomputes the estimated durations and paths between all goal poses of a map"
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--map_name', type=str, help='Name of the map', default='brsu')
+
+    parser.add_argument('--directory', type=str, help='Directory where the duration matrix is stored',
+                        default=None)
+
+    parser.add_argument('--planner_backend', type=str, help='Planner backend. By default, the graph backend is '
+                        'used if there is a map file maps/<map_name>.yaml', choices=planner_factory.get_backends(),
+                        default=None)
+
+    args = parser.parse_args()
+
+    planner = planner_factory.get_planner(args.map_name, args.planner_backend)
+
+    path = get_duration_matrix_path(args.map_name, get_map_hash(planner.map_graph), args.directory)
+    print("Duration matrix: ", path)
+
+    duration_matrix = DurationMatrix.compute(planner)
+    duration_matrix.save(path)
+
+    print("Goal poses: ", len(duration_matrix.goals))
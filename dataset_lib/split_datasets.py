@@ -1,6 +1,8 @@
 import argparse
+
+import numpy as np
 from dataset_lib.load_dataset import load_yaml_dataset
-import yaml
+from dataset_lib.utils.datasets import store_as_yaml
 
 
 def get_task_scalability_dataset(n_tasks_set, tasks):
@@ -20,6 +22,45 @@ def get_task_scalability_dataset(n_tasks_set, tasks):
     return new_tasks
 
 
+def get_ranks_in_set(set_numbers, earliest_pickup_times):
+    """ Returns the position of each task in its set when the tasks of the set are sorted by earliest pickup time.
+    Ties keep the order of the input, as in get_task_scalability_dataset
+
+    :param set_numbers: array with the set number of each task
+    :param earliest_pickup_times: array with the earliest pickup time of each task
+    :return: array of ranks, the first task of each set has rank 0
+    """
+    order = np.lexsort((earliest_pickup_times, set_numbers))
+    sorted_sets = set_numbers[order]
+    set_starts = np.flatnonzero(np.r_[True, sorted_sets[1:] != sorted_sets[:-1]])
+    set_sizes = np.diff(np.r_[set_starts, len(order)])
+
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - np.repeat(set_starts, set_sizes)
+    return ranks
+
+
+def get_task_scalability_datasets(dataset, sizes):
+    """ Yields (n_tasks_set, dataset dict) with the first n_tasks_set tasks (by earliest pickup time) of each set
+    for each n_tasks_set in sizes. The tasks are grouped and sorted once for all sizes
+
+    :param dataset: DatasetView, e.g., returned by load_yaml_dataset
+    :param sizes: numbers of tasks per set
+    """
+    ranks = get_ranks_in_set(dataset.set_number, dataset.earliest_pickup_time)
+    task_dicts = dataset.get_task_dicts()
+    metadata = dataset.metadata
+
+    for n_tasks_set in sizes:
+        new_dataset = dict(metadata)
+        new_dataset['tasks'] = {task_dicts[i]['task_id']: task_dicts[i] for i in np.flatnonzero(ranks < n_tasks_set)}
+        yield n_tasks_set, new_dataset
+
+
+def parse_sizes(sizes_str):
+    return sorted({int(size) for size in sizes_str.split(',')})
+
+
 if __name__ == '__main__':
 
     "Split a dataset of n tasks into sets of n_tasks"
@@ -27,21 +68,39 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
 
     parser.add_argument('dataset_name', type=str, help='Name of the dataset')
-    parser.add_argument('new_dataset_name', type=str, help='Name of the new dataset')
-    parser.add_argument('n_tasks_set', type=int, help='Number of tasks per set')
+    parser.add_argument('new_dataset_name', type=str, help='Name of the new dataset. With --sizes, the dataset of '
+                        'each size is named <new_dataset_name>_<size>')
+    parser.add_argument('n_tasks_set', type=int, nargs='?', help='Number of tasks per set')
+
+    parser.add_argument('--sizes', type=parse_sizes, help='Numbers of tasks per set, e.g. 5,10,15,20,25. '
+                        'The dataset is loaded once and a new dataset is written for each size', default=None)
 
     parser.add_argument('--task_type', type=str, help='Task type', choices=['task'], default='task')
 
+    parser.add_argument('--interned_paths', action='store_true', help='Store task paths as indices to a table '
+                        'of node names')
+
+    parser.add_argument('--nodes_file', type=str, help='With --interned_paths, store the table of node names in '
+                        'this file of datasets/, shared by all new datasets', default=None)
+
     args = parser.parse_args()
 
+    if args.sizes is None and args.n_tasks_set is None:
+        parser.error('n_tasks_set or --sizes is required')
+
     dataset = load_yaml_dataset(args.dataset_name, args.task_type)
 
-    tasks = get_task_scalability_dataset(args.n_tasks_set, dataset['tasks'])
+    if args.sizes is None:
+        tasks = get_task_scalability_dataset(args.n_tasks_set, dataset['tasks'])
 
-    dataset['tasks'] = tasks
+        dataset['tasks'] = tasks
 
-    dataset_file = 'datasets/' + args.new_dataset_name + '.yaml'
-    print(dataset_file)
+        dataset_file = 'datasets/' + args.new_dataset_name + '.yaml'
+        print(dataset_file)
+        store_as_yaml(dataset.to_dict(), dataset_file, args.interned_paths, args.nodes_file)
 
-    with open(dataset_file, 'w') as outfile:
-        yaml.safe_dump(dataset, outfile, default_flow_style=False)
\ No newline at end of file
+    else:
+        for n_tasks_set, new_dataset in get_task_scalability_datasets(dataset, args.sizes):
+            dataset_file = 'datasets/' + args.new_dataset_name + '_' + str(n_tasks_set) + '.yaml'
+            print(dataset_file)
+            store_as_yaml(new_dataset, dataset_file, args.interned_paths, args.nodes_file)
@@ -0,0 +1,189 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from dataset_lib.config.creators import creator_registry
+from dataset_lib.create_datasets import create_datasets
+from dataset_lib.utils.datasets import load_yaml, get_dataset_name
+
+INTERVAL_TYPES = ['tight', 'loose', 'random']
+
+DEFAULT_SPEC = {'n_tasks': [25],
+                'n_overlapping_sets': [5],
+                'pickup_time_boundaries': [[30, 60]],
+                'time_window_boundaries': [[30, 120]],
+                'replicates': 1,
+                'dataset_start_time': 2700,
+                'duration_range': [30, 120],
+                'map_name': 'brsu',
+                'map_sections': ['square', 'street', 'faraway'],
+                'task_type': 'task',
+                'interned_paths': False,
+                'seed': None}
+
+
+def parse_range(range_str):
+    """ Parses 'start:stop:step' (stop included) or a comma separated list of ints
+
+    :param range_str: e.g. '5:25:5' or '5,10,25'
+    :return: list of ints
+    """
+    if ':' in range_str:
+        bounds = [int(value) for value in range_str.split(':')]
+        start, stop = bounds[0], bounds[1]
+        step = bounds[2] if len(bounds) > 2 else 1
+        return list(range(start, stop + 1, step))
+    return [int(value) for value in range_str.split(',')]
+
+
+def parse_bounds(bounds_str):
+    """ Parses the lower and upper bound of an interval given as 'min,max'
+
+    :param bounds_str: e.g. '30,120'
+    :return: [min, max]
+    """
+    bounds = bounds_str.split(',')
+    if len(bounds) != 2:
+        raise argparse.ArgumentTypeError("Expected min,max, got %s" % bounds_str)
+    try:
+        lower_bound, upper_bound = int(bounds[0]), int(bounds[1])
+    except ValueError:
+        raise argparse.ArgumentTypeError("Expected min,max, got %s" % bounds_str)
+    if lower_bound > upper_bound:
+        raise argparse.ArgumentTypeError("The lower bound of %s is greater than the upper bound" % bounds_str)
+    return [lower_bound, upper_bound]
+
+
+def expand_sweep(spec, datasets_dir='datasets/'):
+    """ Expands a sweep specification into a list of jobs, one per combination of
+    n_tasks, n_overlapping_sets, pickup_time_boundaries, time_window_boundaries and replicate
+
+    Each job creates a dataset per time window interval type (see create_datasets). The names of the datasets
+    are reserved here
+
+    :param spec: dict with the keys of DEFAULT_SPEC
+    :param datasets_dir: directory where the datasets are stored
+    :return: list of jobs (dicts)
+    """
+    spec = dict(DEFAULT_SPEC, **spec)
+
+    seed = spec['seed']
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+
+    combinations = itertools.product(spec['n_tasks'], spec['n_overlapping_sets'], spec['pickup_time_boundaries'],
+                                     spec['time_window_boundaries'], range(spec['replicates']))
+    jobs = list()
+
+    for i, (n_tasks, n_overlapping_sets, pickup_time_boundaries, time_window_boundaries, replicate) in \
+            enumerate(combinations):
+        dataset_names = {interval_type: get_dataset_name(n_tasks, n_overlapping_sets, interval_type, datasets_dir)
+                         for interval_type in INTERVAL_TYPES}
+
+        jobs.append({'n_tasks': n_tasks,
+                     'n_overlapping_sets': n_overlapping_sets,
+                     'dataset_start_time': spec['dataset_start_time'],
+                     'pickup_time_boundaries': pickup_time_boundaries,
+                     'time_window_boundaries': time_window_boundaries,
+                     'duration_range': list(range(spec['duration_range'][0], spec['duration_range'][1] + 1)),
+                     'map_name': spec['map_name'],
+                     'map_sections': spec['map_sections'],
+                     'task_type': spec['task_type'],
+                     'interned_paths': spec['interned_paths'],
+                     'dataset_names': dataset_names,
+                     'datasets_dir': datasets_dir,
+                     'catalog': True,
+                     'seed': [seed, i]})
+    return jobs
+
+
+def _init_worker(map_name):
+    # Loads the map once per worker, all the jobs the worker runs share its pose creator
+    creator_registry.get_pose_creator(map_name)
+
+
+def run_job(job):
+    """ Runs a job created by expand_sweep and returns the list of dataset files
+    """
+    job = dict(job)
+    return create_datasets(job.pop('n_tasks'), job.pop('n_overlapping_sets'), job.pop('dataset_start_time'),
+                           job.pop('pickup_time_boundaries'), job.pop('time_window_boundaries'),
+                           job.pop('duration_range'), verbose=False, **job)
+
+
+def run_sweep(jobs, workers=None):
+    """ Runs the jobs in a pool of processes and prints the progress and throughput
+
+    :param jobs: list of jobs created by expand_sweep
+    :param workers: number of processes. If None, os.cpu_count() is used
+    :return: list of dataset files
+    """
+    if not jobs:
+        return list()
+
+    start_time = time.time()
+    dataset_files = list()
+    n_tasks = 0
+    map_name = jobs[0]['map_name']
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(map_name,)) as executor:
+        futures = {executor.submit(run_job, job): job for job in jobs}
+        for n_done, future in enumerate(as_completed(futures), 1):
+            dataset_files.extend(future.result())
+            n_tasks += futures[future]['n_tasks'] * len(INTERVAL_TYPES)
+            elapsed = time.time() - start_time
+            print("[%s/%s] jobs, %s datasets, %.2f datasets/s, %.1f tasks/s" %
+                  (n_done, len(jobs), len(dataset_files), len(dataset_files) / elapsed, n_tasks / elapsed))
+
+    return dataset_files
+
+
+if __name__ == '__main__':
+
+    "Creates datasets for every combination of the sweep parameters"
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--spec', type=str, help='Yaml file with the sweep specification. '
+                        'Command line parameters override the values in the file', default=None)
+
+    parser.add_argument('--n_tasks', type=parse_range, help='Numbers of tasks, e.g. 5:25:5 or 5,10,25',
+                        default=None)
+
+    parser.add_argument('--n_overlapping_sets', type=parse_range, help='Numbers of sets of consecutive tasks, '
+                        'e.g. 1,5', default=None)
+
+    parser.add_argument('--pickup_time_boundaries', type=parse_bounds, nargs='+',
+                        help='Pickup time interval boundaries, e.g. 30,60 60,120', default=None)
+
+    parser.add_argument('--time_window_boundaries', type=parse_bounds, nargs='+',
+                        help='Time window interval boundaries, e.g. 30,120 60,300', default=None)
+
+    parser.add_argument('--duration_range', type=parse_bounds, help='Minimum and maximum duration (seconds) '
+                        'between pickup and delivery, e.g. 30,120', default=None)
+
+    parser.add_argument('--replicates', type=int, help='Number of datasets per combination', default=None)
+
+    parser.add_argument('--seed', type=int, help='Seed of the sweep', default=None)
+
+    parser.add_argument('--workers', type=int, help='Number of processes', default=None)
+
+    args = parser.parse_args()
+
+    spec = load_yaml(args.spec) if args.spec else dict()
+    for key in ['n_tasks', 'n_overlapping_sets', 'pickup_time_boundaries', 'time_window_boundaries',
+                'duration_range', 'replicates', 'seed']:
+        if getattr(args, key) is not None:
+            spec[key] = getattr(args, key)
+
+    jobs = expand_sweep(spec)
+    print("Jobs: ", len(jobs))
+    print("Seed: ", jobs[0]['seed'][0] if jobs else None)
+
+    if not os.path.exists('datasets/'):
+        os.makedirs('datasets/')
+
+    run_sweep(jobs, args.workers)
@@ -0,0 +1,199 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from dataset_lib.load_dataset import load_dataset_file
+from dataset_lib.split_datasets import get_ranks_in_set
+from dataset_lib.utils.datasets import DATASET_EXTENSIONS, store_as_yaml, store_as_npz, store_as_jsonl, \
+    load_yaml_cached, is_dataset
+
+
+# Each transform receives a TaskTable, the dataset metadata (dict) and its arguments and returns a TaskTable.
+# Transforms may read the metadata
+
+def shift_times(tasks, metadata, time_):
+    """ Adds time_ (seconds) to the earliest and latest pickup times, like postpone_dataset.py
+    """
+    time_ = int(time_)
+    constrained = tasks.earliest_pickup_time != -1
+    return tasks.replace(earliest_pickup_time=np.where(constrained, tasks.earliest_pickup_time + time_, -1),
+                         latest_pickup_time=np.where(constrained, tasks.latest_pickup_time + time_, -1))
+
+
+def truncate_sets(tasks, metadata, n_tasks_set):
+    """ Keeps the first n_tasks_set tasks (by earliest pickup time) of each set, like split_datasets.py
+    """
+    return tasks.take(get_ranks_in_set(tasks.set_number, tasks.earliest_pickup_time) < int(n_tasks_set))
+
+
+def filter_sets(tasks, metadata, *set_numbers):
+    """ Keeps the tasks of the given sets
+    """
+    return tasks.take(np.isin(tasks.set_number, [int(set_number) for set_number in set_numbers]))
+
+
+def filter_sections(tasks, metadata, *map_sections):
+    """ Keeps the sets of tasks of the given map sections
+
+    The sets of overlapping datasets take their poses from one map section, set i from
+    metadata['map_sections'][i % len(metadata['map_sections'])] (see OverlappingTW.iter_tasks_sets).
+    The set numbers are kept, so metadata['map_sections'] is not changed and the mapping still holds for the
+    filtered dataset. The tasks of non overlapping datasets mix all the sections, so they cannot be filtered by
+    section
+    """
+    if metadata['dataset_type'] != 'overlapping':
+        raise ValueError("Only overlapping datasets can be filtered by map section")
+    dataset_sections = metadata['map_sections']
+    set_numbers = [set_number for set_number in np.unique(tasks.set_number).tolist()
+                   if dataset_sections[set_number % len(dataset_sections)] in map_sections]
+    return filter_sets(tasks, metadata, *set_numbers)
+
+
+def scale_windows(tasks, metadata, factor):
+    """ Multiplies the pickup time window (latest - earliest pickup time) of each task by factor.
+    The earliest pickup times do not change
+    """
+    constrained = tasks.earliest_pickup_time != -1
+    windows = np.rint((tasks.latest_pickup_time - tasks.earliest_pickup_time) * float(factor)).astype(np.int64)
+    return tasks.replace(latest_pickup_time=np.where(constrained, tasks.earliest_pickup_time + windows, -1))
+
+
+TRANSFORMS = {'shift': shift_times,
+              'truncate': truncate_sets,
+              'sets': filter_sets,
+              'sections': filter_sections,
+              'scale': scale_windows}
+
+
+def parse_transform(transform_str):
+    """ Parses 'name:arg,arg,...', e.g., 'shift:300', 'truncate:5', 'sets:0,2', 'sections:square', 'scale:1.5'
+
+    :return: (name, list of args as str)
+    """
+    name, _, args_str = transform_str.partition(':')
+    if name not in TRANSFORMS:
+        raise argparse.ArgumentTypeError("Unknown transform %s, use one of %s" % (name, ', '.join(TRANSFORMS)))
+    return name, [arg for arg in args_str.split(',') if arg]
+
+
+def transform_dataset(dataset, transforms):
+    """ Applies the transforms in order to the tasks of a dataset
+
+    :param dataset: DatasetView, e.g., returned by load_dataset_file
+    :param transforms: list of (name, args), see TRANSFORMS and parse_transform
+    :return: dataset dict whose tasks are a TaskTable, which can be stored with store_as_yaml, store_as_npz
+    or store_as_jsonl
+    """
+    metadata = dict(dataset.metadata)
+    tasks = dataset.table
+    for name, args in transforms:
+        tasks = TRANSFORMS[name](tasks, metadata, *args)
+    return dict(metadata, tasks=tasks)
+
+
+def store_dataset_file(dataset, dataset_file, interned_paths=False, nodes_file=None):
+    """ Stores the dataset in the format given by the extension of dataset_file
+    """
+    file_extension = os.path.splitext(dataset_file)[1]
+    if file_extension == '.yaml':
+        store_as_yaml(dataset, dataset_file, interned_paths, nodes_file)
+    elif file_extension == '.npz':
+        store_as_npz(dataset, dataset_file)
+    elif file_extension == '.jsonl':
+        store_as_jsonl(dataset, dataset_file)
+    else:
+        raise ValueError(file_extension)
+
+
+def transform_file(dataset_file, output_file, transforms, task_type='task', interned_paths=False, nodes_file=None):
+    """ Loads dataset_file, applies the transforms and stores the result in output_file. The formats of both files
+    are given by their extensions
+
+    :return: output_file
+    """
+    dataset = transform_dataset(load_dataset_file(dataset_file, task_type), transforms)
+    store_dataset_file(dataset, output_file, interned_paths, nodes_file)
+    return output_file
+
+
+def get_dataset_files(input_dir):
+    """ Returns the names of the dataset files in input_dir. Yaml files that are not datasets, e.g., shared node
+    tables, are skipped. Yaml files are parsed through the cache (see load_yaml_cached), so loading them again
+    to transform them is cheap
+    """
+    return sorted(file_ for file_ in os.listdir(input_dir) if file_.endswith(DATASET_EXTENSIONS) and
+                  (not file_.endswith('.yaml') or is_dataset(load_yaml_cached(os.path.join(input_dir, file_)))))
+
+
+def transform_datasets(input_dir, output_dir, transforms, workers=None, file_format=None, **kwargs):
+    """ Applies the same transforms to every dataset file in input_dir, in a pool of processes
+
+    :param input_dir: directory of the datasets
+    :param output_dir: directory of the transformed datasets, with the same names as in input_dir
+    :param transforms: list of (name, args), see transform_dataset
+    :param workers: number of processes. If None, os.cpu_count() is used
+    :param file_format: extension of the output files (yaml, npz or jsonl). If None, the format of each input
+    file is kept
+    :param kwargs: passed to transform_file (task_type, interned_paths, nodes_file)
+    :return: list of output files
+    """
+    if os.path.abspath(input_dir) == os.path.abspath(output_dir):
+        raise ValueError("The output directory must be different from the input directory")
+    dataset_files = get_dataset_files(input_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    start_time = time.time()
+    output_files = list()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = list()
+        for file_ in dataset_files:
+            name, extension = os.path.splitext(file_)
+            output_file = os.path.join(output_dir, name + ('.' + file_format if file_format else extension))
+            futures.append(executor.submit(transform_file, os.path.join(input_dir, file_), output_file, transforms,
+                                           **kwargs))
+
+        for n_done, future in enumerate(as_completed(futures), 1):
+            output_files.append(future.result())
+            elapsed = time.time() - start_time
+            print("[%s/%s] datasets, %.2f datasets/s" % (n_done, len(futures), n_done / elapsed))
+
+    return sorted(output_files)
+
+
+if __name__ == '__main__':
+
+    "Applies a chain of transforms to a dataset, or to every dataset of a directory, and writes the result once"
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('input', type=str, help='Dataset file (.yaml, .npz or .jsonl) or directory of datasets')
+    parser.add_argument('output', type=str, help='Output dataset file, or output directory if input is a directory')
+
+    parser.add_argument('--transform', type=parse_transform, action='append', dest='transforms', required=True,
+                        help='Transform to apply, in the order given: shift:<seconds>, truncate:<n_tasks_set>, '
+                        'sets:<set_number>,..., sections:<map_section>,... or scale:<factor>')
+
+    parser.add_argument('--task_type', type=str, help='Task type', choices=['task'], default='task')
+
+    parser.add_argument('--file_format', type=str, help='Format of the output files in batch mode. '
+                        'By default, the format of each input file is kept', choices=['yaml', 'npz', 'jsonl'],
+                        default=None)
+
+    parser.add_argument('--interned_paths', action='store_true', help='Store task paths as indices to a table '
+                        'of node names (yaml only)')
+
+    parser.add_argument('--nodes_file', type=str, help='With --interned_paths, store the table of node names in '
+                        'this file of the output directory, shared by all output datasets', default=None)
+
+    parser.add_argument('--workers', type=int, help='Number of processes in batch mode', default=None)
+
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        transform_datasets(args.input, args.output, args.transforms, args.workers, args.file_format,
+                           task_type=args.task_type, interned_paths=args.interned_paths, nodes_file=args.nodes_file)
+    else:
+        print(transform_file(args.input, args.output, args.transforms, args.task_type, args.interned_paths,
+                             args.nodes_file))
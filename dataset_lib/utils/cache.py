@@ -0,0 +1,73 @@
+""" Includes a bounded cache used to memoize planner queries
+"""
+
+import collections
+
+
+class LRUCache:
+    """ Dictionary-like cache that keeps at most maxsize entries and evicts the
+    least recently used entry when full
+
+    maxsize (int): Maximum number of entries. If None, the cache is unbounded
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """ Returns the value of key and marks it as the most recently used entry
+
+        :param key: cache key
+        :param default: value to return if key is not in the cache
+        :return: cached value or default
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """ Adds key to the cache, evicting the least recently used entry if the cache is full
+
+        :param key: cache key
+        :param value: value to store
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if self.maxsize is not None and len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def items(self):
+        """ Returns a list of (key, value) from the least to the most recently used entry
+        """
+        return list(self._entries.items())
+
+    def update(self, items):
+        """ Adds the (key, value) pairs in items to the cache
+        """
+        for key, value in items:
+            self.put(key, value)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """ Returns the cache counters as a dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
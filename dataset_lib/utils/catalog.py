@@ -0,0 +1,201 @@
+""" Includes a SQLite catalog with the metadata of the datasets in a directory
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+CATALOG_FILE = '.catalog.sqlite'
+
+COLUMNS = [('dataset_name', 'TEXT'),
+           ('file_path', 'TEXT PRIMARY KEY'),
+           ('file_format', 'TEXT'),
+           ('dataset_type', 'TEXT'),
+           ('pickup_interval_type', 'TEXT'),
+           ('pickup_lower_bound', 'INTEGER'),
+           ('pickup_upper_bound', 'INTEGER'),
+           ('time_window_interval_type', 'TEXT'),
+           ('time_window_lower_bound', 'INTEGER'),
+           ('time_window_upper_bound', 'INTEGER'),
+           ('n_tasks', 'INTEGER'),
+           ('n_sets', 'INTEGER'),
+           ('start_time', 'INTEGER'),
+           ('end_time', 'INTEGER'),
+           ('map_sections', 'TEXT'),
+           ('content_hash', 'TEXT'),
+           ('updated_at', 'REAL')]
+
+
+def get_catalog_path(dataset_file):
+    """ Returns the path of the catalog of the directory of dataset_file
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(dataset_file)), CATALOG_FILE)
+
+
+def get_file_hash(file):
+    sha1 = hashlib.sha1()
+    with open(file, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class TasksSummary:
+    """ Number of tasks, number of sets, start time and end time of a dataset, computed one task at a time
+    """
+
+    def __init__(self):
+        self.n_tasks = 0
+        self.set_numbers = set()
+        self.start_time = None
+        self.end_time = None
+
+    def add(self, task):
+        """ Adds a task in dict format. Tasks without temporal constraints are only counted
+        """
+        self.n_tasks += 1
+        self.set_numbers.add(task['set_number'])
+        if task['latest_pickup_time'] is None:
+            return
+        finish_time = task['latest_pickup_time'] + task['plan']['estimated_duration']
+        if self.start_time is None or task['earliest_pickup_time'] < self.start_time:
+            self.start_time = task['earliest_pickup_time']
+        if self.end_time is None or finish_time > self.end_time:
+            self.end_time = finish_time
+
+    def to_dict(self):
+        return {'n_tasks': self.n_tasks,
+                'n_sets': len(self.set_numbers),
+                'start_time': self.start_time,
+                'end_time': self.end_time}
+
+
+def get_dataset_summary(dataset):
+    """ Returns the number of tasks, number of sets, start time and end time of a dataset
+
+    :param dataset: dictionary with the tasks as a dict of task dicts or as a TaskTable
+    :return: dict
+    """
+    tasks = dataset.get('tasks') or dict()
+    if not hasattr(tasks, 'to_columns'):
+        summary = TasksSummary()
+        for task in tasks.values():
+            summary.add(task)
+        return summary.to_dict()
+
+    # TaskTable, tasks without temporal constraints have -1 as pickup times
+    constrained = tasks.latest_pickup_time != -1
+    earliest_pickup_times = tasks.earliest_pickup_time[constrained]
+    finish_times = (tasks.latest_pickup_time + tasks.estimated_duration)[constrained]
+
+    return {'n_tasks': len(tasks),
+            'n_sets': len(set(tasks.set_number.tolist())),
+            'start_time': int(earliest_pickup_times.min()) if len(earliest_pickup_times) else None,
+            'end_time': int(finish_times.max()) if len(finish_times) else None}
+
+
+class Catalog:
+    """ SQLite catalog with one row per dataset file
+
+    Allows selecting datasets by their metadata without reading the dataset files
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=60)
+        self._connection.row_factory = sqlite3.Row
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS datasets (%s)' %
+                                     ', '.join(name + ' ' + column_type for name, column_type in COLUMNS))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def record(self, dataset, dataset_file, file_format, summary=None):
+        """ Adds or updates the entry of dataset_file
+
+        :param dataset: dictionary of tasks, as stored in dataset_file
+        :param dataset_file: path of the dataset file
+        :param file_format: e.g. 'yaml', 'npz' or 'jsonl'
+        :param summary: dict returned by get_dataset_summary. If None, it is computed from dataset['tasks']
+        """
+        pickup_time_interval = dataset.get('pickup_time_interval') or dict()
+        time_window_interval = dataset.get('time_window_interval') or dict()
+
+        # The name is taken from the file, the dataset_name field is not updated when a dataset is copied
+        entry = {'dataset_name': os.path.splitext(os.path.basename(dataset_file))[0],
+                 'file_path': os.path.abspath(dataset_file),
+                 'file_format': file_format,
+                 'dataset_type': dataset.get('dataset_type'),
+                 'pickup_interval_type': pickup_time_interval.get('interval_type'),
+                 'pickup_lower_bound': pickup_time_interval.get('lower_bound'),
+                 'pickup_upper_bound': pickup_time_interval.get('upper_bound'),
+                 'time_window_interval_type': time_window_interval.get('interval_type'),
+                 'time_window_lower_bound': time_window_interval.get('lower_bound'),
+                 'time_window_upper_bound': time_window_interval.get('upper_bound'),
+                 'map_sections': json.dumps(dataset.get('map_sections')),
+                 'content_hash': get_file_hash(dataset_file),
+                 'updated_at': time.time()}
+        entry.update(summary or get_dataset_summary(dataset))
+
+        names = [name for name, _ in COLUMNS]
+        with self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO datasets (%s) VALUES (%s)' %
+                                     (', '.join(names), ', '.join('?' * len(names))),
+                                     [entry[name] for name in names])
+
+    def remove(self, dataset_file):
+        with self._connection:
+            self._connection.execute('DELETE FROM datasets WHERE file_path = ?', (os.path.abspath(dataset_file),))
+
+    def query(self, **kwargs):
+        """ Returns the entries (dicts) that match all the given filters, ordered by dataset_name
+
+        kwargs:
+            dataset_type, file_format, pickup_interval_type, time_window_interval_type, n_sets: exact match
+            min_tasks, max_tasks: bounds on n_tasks (inclusive)
+            map_section: section contained in map_sections
+        """
+        conditions = list()
+        values = list()
+        for name in ['dataset_name', 'dataset_type', 'file_format', 'pickup_interval_type',
+                     'time_window_interval_type', 'n_sets']:
+            if kwargs.get(name) is not None:
+                conditions.append(name + ' = ?')
+                values.append(kwargs[name])
+        if kwargs.get('min_tasks') is not None:
+            conditions.append('n_tasks >= ?')
+            values.append(kwargs['min_tasks'])
+        if kwargs.get('max_tasks') is not None:
+            conditions.append('n_tasks <= ?')
+            values.append(kwargs['max_tasks'])
+        if kwargs.get('map_section') is not None:
+            conditions.append('map_sections LIKE ?')
+            values.append('%' + json.dumps(kwargs['map_section']) + '%')
+
+        statement = 'SELECT * FROM datasets'
+        if conditions:
+            statement += ' WHERE ' + ' AND '.join(conditions)
+        statement += ' ORDER BY dataset_name, file_format'
+
+        entries = list()
+        for row in self._connection.execute(statement, values):
+            entry = dict(row)
+            entry['map_sections'] = json.loads(entry['map_sections'])
+            entries.append(entry)
+        return entries
+
+
+def update_catalog(dataset, dataset_file, file_format, summary=None):
+    """ Records dataset_file in the catalog of its directory
+    """
+    with Catalog(get_catalog_path(dataset_file)) as catalog:
+        catalog.record(dataset, dataset_file, file_format, summary)
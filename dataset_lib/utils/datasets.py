@@ -2,11 +2,55 @@
 """
 
 import collections
+import contextlib
 import csv
+import errno
+import json
 import os
+import pickle
+import struct
+import tempfile
+import time
+import weakref
+import zipfile
 from pathlib import Path
 
+import numpy as np
 import yaml
+from dataset_lib.utils.catalog import update_catalog, get_file_hash, TasksSummary
+from dataset_lib.utils.stats import stats
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, see _file_lock
+    fcntl = None
+
+# Use the libyaml bindings if they are available
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+SafeDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+CACHE_DIR = '.cache'
+
+DATASET_IDS_FILE = '.dataset_ids.json'
+
+# Extensions of the dataset files that share a dataset name
+DATASET_EXTENSIONS = ('.yaml', '.npz', '.jsonl')
+
+
+class _FlowSequence(list):
+    """ List that is dumped in flow style, e.g., [0, 4, 7]
+    """
+    pass
+
+
+class DatasetDumper(SafeDumper):
+    pass
+
+
+DatasetDumper.add_representer(_FlowSequence,
+                              lambda dumper, data: dumper.represent_sequence('tag:yaml.org,2002:seq', data,
+                                                                             flow_style=True))
 
 
 def load_yaml(file):
@@ -16,10 +60,83 @@ def load_yaml(file):
     :return: data as dict()
     """
     with open(file, 'r') as file:
-        data = yaml.safe_load(file)
+        data = yaml.load(file, Loader=SafeLoader)
     return data
 
 
+def load_yaml_cached(file, cache_dir=None):
+    """ Reads a yaml file and returns a dictionary with its contents. The contents are cached as a pickle file
+    in cache_dir and read from there as long as the yaml file does not change
+
+    The cache entry is valid if the modification time and size of the file are the same as when the entry was
+    written or, otherwise, if the content hash of the file is the same
+
+    :param file: file to load
+    :param cache_dir: directory of the cache. If None, a .cache directory next to the file is used
+    :return: data as dict()
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file)), CACHE_DIR)
+    cache_file = os.path.join(cache_dir, os.path.basename(file) + '.pickle')
+
+    file_stat = os.stat(file)
+    stamp = (file_stat.st_mtime_ns, file_stat.st_size)
+
+    entry = None
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as infile:
+                entry = pickle.load(infile)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            entry = None
+
+    if entry is not None and entry['stamp'] == stamp:
+        stats.count('yaml_cache.hits')
+        return entry['data']
+
+    file_hash = get_file_hash(file)
+
+    if entry is not None and entry['hash'] == file_hash:
+        stats.count('yaml_cache.hits')
+        data = entry['data']
+    else:
+        stats.count('yaml_cache.misses')
+        data = load_yaml(file)
+
+    _write_atomic(cache_file, 'wb',
+                  lambda outfile: pickle.dump({'stamp': stamp, 'hash': file_hash, 'data': data}, outfile,
+                                              protocol=pickle.HIGHEST_PROTOCOL))
+    return data
+
+
+@contextlib.contextmanager
+def _atomic_file(file, mode):
+    """ Yields a temporary file that replaces file when the context exits without errors, so that readers
+    never see a partially written file
+    """
+    directory = os.path.dirname(os.path.abspath(file))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=directory, prefix='.tmp_')
+    try:
+        with os.fdopen(fd, mode) as outfile:
+            yield outfile
+        # mkstemp creates the file readable only by the owner
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_file, 0o666 & ~umask)
+        os.replace(tmp_file, file)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+
+
+def _write_atomic(file, mode, write):
+    """ Calls write with a temporary file that replaces file once it is written (see _atomic_file)
+    """
+    with _atomic_file(file, mode) as outfile:
+        write(outfile)
+
+
 def flatten_dict(dict_input):
     """ Returns a dictionary without nested dictionaries
 
@@ -75,21 +192,328 @@ def to_csv(list_dicts, file_name):
     # We assume that all the dictionaries have the same keys
     fieldnames = list_dicts[0].keys()
 
-    with open(file_name, 'w') as output_file:
+    def write(output_file):
         dict_writer = csv.DictWriter(output_file, fieldnames)
         dict_writer.writeheader()
         dict_writer.writerows(list_dicts)
 
+    _write_atomic(file_name, 'w', write)
+
+
+def intern_paths(dataset, nodes=None):
+    """ Returns a copy of the dataset in which the node names of the task paths are stored once in
+    dataset['nodes'] and each path is a list of indices to dataset['nodes']
+
+    :param dataset: dictionary with tasks in dict format
+    :param nodes: list of node names to extend, e.g., a table shared by all datasets of a map.
+    If None, a new table is created
+    :return: dataset with interned paths
+    """
+    nodes = list() if nodes is None else nodes
+    node_index = {node: i for i, node in enumerate(nodes)}
+
+    def get_index(node):
+        if node not in node_index:
+            node_index[node] = len(nodes)
+            nodes.append(node)
+        return node_index[node]
+
+    interned_tasks = dict()
+    for task_id, task in dataset.get('tasks').items():
+        interned_task = dict(task)
+        plan = dict(task['plan'])
+        plan['path'] = _FlowSequence(get_index(node) for node in plan['path'])
+        interned_task['plan'] = plan
+        interned_tasks[task_id] = interned_task
+
+    interned_dataset = dict(dataset)
+    interned_dataset['nodes'] = nodes
+    interned_dataset['tasks'] = interned_tasks
+    return interned_dataset
+
+
+def is_dataset(data):
+    """ Returns True if data, e.g., the content of a yaml file, is a dataset and not, e.g., a shared node table
+    """
+    return isinstance(data, dict) and 'tasks' in data
+
+
+def expand_paths(dataset, dataset_dir=''):
+    """ Replaces the indices in the task paths of a dataset with interned paths by the node names.
+    Datasets without interned paths are returned unchanged
+
+    :param dataset: dataset as loaded from a yaml file
+    :param dataset_dir: directory of the dataset file, used to read a node table stored in a separate file
+    :return: dataset with node names in the task paths
+    """
+    nodes = dataset.pop('nodes', None)
+    if nodes is None:
+        return dataset
+
+    if isinstance(nodes, str):
+        nodes = load_yaml(os.path.join(dataset_dir, nodes))
 
-def store_as_yaml(dataset, dataset_file):
+    for task in dataset.get('tasks').values():
+        plan = task['plan']
+        plan['path'] = [nodes[i] for i in plan['path']]
+
+    return dataset
+
+
+def store_as_yaml(dataset, dataset_file, interned_paths=False, nodes_file=None, catalog=False):
     """ Receives a dictionary (in yaml format) and stores it as yaml in path
 
     :param dataset: dictionary of tasks
-    :param path: path where the dataset will be stored
+    :param dataset_file: path where the dataset will be stored
+    :param interned_paths: if True, the task paths are stored as indices to a table of node names
+    :param nodes_file: name of a node table file in the directory of dataset_file shared by several datasets.
+    If None, the node table is stored in the dataset file
+    :param catalog: if True, the dataset is recorded in the catalog of the directory of dataset_file (see
+    catalog_datasets.py)
+    """
+    if hasattr(dataset.get('tasks'), 'to_dict'):
+        # TaskTable
+        dataset = dict(dataset, tasks=dataset['tasks'].to_dict())
+
+    if interned_paths:
+        if nodes_file:
+            nodes_path = os.path.join(os.path.dirname(dataset_file), nodes_file)
+            # The node table may be extended by several writers at the same time
+            with _file_lock(os.path.join(os.path.dirname(dataset_file), '.' + nodes_file + '.lock')):
+                nodes = load_yaml(nodes_path) if os.path.exists(nodes_path) else None
+                dataset = intern_paths(dataset, nodes)
+                nodes = dataset['nodes']
+                _write_atomic(nodes_path, 'w',
+                              lambda outfile: yaml.dump(nodes, outfile, Dumper=SafeDumper, default_flow_style=False))
+            dataset['nodes'] = nodes_file
+        else:
+            dataset = intern_paths(dataset)
+
+    with stats.timer('store_as_yaml'):
+        _write_atomic(dataset_file, 'w',
+                      lambda outfile: yaml.dump(dataset, outfile, Dumper=DatasetDumper, default_flow_style=False))
+
+    if catalog:
+        update_catalog(dataset, dataset_file, 'yaml')
+
+
+def dataset_to_columns(dataset):
+    """ Converts a dataset with tasks in dict format to a dict of arrays, one per task field (see TaskTable)
+    plus the dataset metadata as a json string. Tasks are ordered by task_id
+
+    :param dataset: dictionary of tasks
+    :return: dict of numpy arrays
+    """
+    # Imported here because dataset_lib.config.task imports this module
+    from dataset_lib.config.task_table import TaskTable
+
+    tasks = dataset.get('tasks')
+    if not isinstance(tasks, TaskTable):
+        tasks = TaskTable.from_dicts(task for _, task in sorted(tasks.items()))
+
+    metadata = {key: value for key, value in dataset.items() if key != 'tasks'}
+
+    columns = tasks.to_columns()
+    columns['metadata'] = np.array(json.dumps(metadata))
+    return columns
+
+
+def columns_to_dataset(columns):
+    """ Converts a dict of arrays created by dataset_to_columns back to a dataset with tasks in dict format
+    """
+    from dataset_lib.config.task_table import TaskTable
+
+    dataset = json.loads(str(columns['metadata']))
+    dataset['tasks'] = TaskTable.from_columns(columns).to_dict()
+    return dataset
+
+
+def store_as_npz(dataset, dataset_file, catalog=False):
+    """ Receives a dictionary (in yaml format) and stores it as an uncompressed .npz file with one array per
+    task field, see dataset_to_columns
+
+    :param dataset: dictionary of tasks
+    :param dataset_file: path where the dataset will be stored
+    :param catalog: if True, the dataset is recorded in the catalog of the directory of dataset_file (see
+    catalog_datasets.py)
+    """
+    with stats.timer('store_as_npz'):
+        columns = dataset_to_columns(dataset)
+        _write_atomic(dataset_file, 'wb', lambda outfile: np.savez(outfile, **columns))
+
+    if catalog:
+        update_catalog(dataset, dataset_file, 'npz')
+
+
+def _memmap_npz_member(file, info, mmap_mode):
+    """ Returns a read-only memory map of an uncompressed array in a .npz file, or None if the array
+    cannot be memory-mapped
+    """
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(file, 'rb') as infile:
+        infile.seek(info.header_offset)
+        local_header = infile.read(30)
+        name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+        infile.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(infile)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(infile)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(infile)
+        else:
+            return None
+        offset = infile.tell()
+
+    if dtype.hasobject or shape == () or 0 in shape:
+        return None
+
+    return np.memmap(file, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape,
+                     order='F' if fortran_order else 'C')
+
+
+def load_npz(file, mmap_mode='r'):
+    """ Reads a dataset file stored with store_as_npz and returns a dictionary of arrays
+
+    :param file: file to load
+    :param mmap_mode: 'r' or 'c' to memory-map the arrays (zero-copy) instead of reading them into memory
+    :return: dict of numpy arrays
+    """
+    columns = dict()
+    with np.load(file) as npz_file:
+        members = {info.filename[:-len('.npy')]: info for info in npz_file.zip.infolist()}
+        for name in npz_file.files:
+            array = _memmap_npz_member(file, members[name], mmap_mode) if mmap_mode else None
+            columns[name] = npz_file[name] if array is None else array
+    return columns
+
+
+def _discard_atomic_file(context):
+    """ Exits a context created by _atomic_file with an error, so that its temporary file is removed
+    """
+    error = RuntimeError("JsonlWriter was not closed")
+    context.__exit__(RuntimeError, error, None)
+
+
+class JsonlWriter:
+    """ Writes a dataset in the JSON Lines format, one task at a time
+
+    The first line is the dataset metadata (dataset_name, dataset_type, start_time, ...) and each of the following
+    lines is a task in dict format. The file is written to a temporary file that replaces dataset_file on close
+
+    Usage:
+        with JsonlWriter(dataset_file, metadata) as writer:
+            for task in dataset_creator.iter_tasks(n_tasks=n_tasks, ...):
+                writer.write_task(task)
+
+    The temporary file is opened when the with block is entered or, without a with block, by the first
+    write_task. In that case close() must be called to write dataset_file; a writer that is garbage collected
+    without being closed removes its temporary file
+    """
+
+    def __init__(self, dataset_file, metadata, catalog=False):
+        """
+        dataset_file (str): path where the dataset will be stored
+        metadata (dict): dataset information, without the tasks
+        catalog (bool): if True, the dataset is recorded in the catalog of the directory of dataset_file on close
+        """
+        self.dataset_file = dataset_file
+        self.metadata = {key: value for key, value in metadata.items() if key != 'tasks'}
+        self.catalog = catalog
+        self.summary = TasksSummary()
+        self._context = None
+        self._file = None
+        self._finalizer = None
+        self._closed = False
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+        elif self._context is not None:
+            self._finalizer.detach()
+            self._context.__exit__(*exc_info)
+            self._context = None
+            self._closed = True
+
+    def open(self):
+        """ Opens the temporary file and writes the metadata line
+        """
+        if self._closed:
+            raise ValueError("JsonlWriter of %s is closed" % self.dataset_file)
+        if self._context is not None:
+            return
+        self._context = _atomic_file(self.dataset_file, 'w')
+        self._file = self._context.__enter__()
+        self._finalizer = weakref.finalize(self, _discard_atomic_file, self._context)
+        self._write_line(self.metadata)
+
+    def _write_line(self, data):
+        self._file.write(json.dumps(data, separators=(',', ':')))
+        self._file.write('\n')
+
+    def write_task(self, task):
+        """ Writes a task in dict format
+        """
+        self.open()
+        self._write_line(task)
+        self.summary.add(task)
+
+    def write_tasks(self, tasks):
+        for task in tasks:
+            self.write_task(task)
+
+    def close(self):
+        """ Replaces dataset_file with the written file. A writer without tasks writes only the metadata
+        """
+        if self._closed:
+            return
+        self.open()
+        self._finalizer.detach()
+        self._context.__exit__(None, None, None)
+        self._context = None
+        self._closed = True
+        if self.catalog:
+            update_catalog(self.metadata, self.dataset_file, 'jsonl', self.summary.to_dict())
+
+
+def store_as_jsonl(dataset, dataset_file, catalog=False):
+    """ Receives a dictionary (in yaml format) and stores it in the JSON Lines format, see JsonlWriter
+
+    :param dataset: dictionary of tasks
+    :param dataset_file: path where the dataset will be stored
+    :param catalog: if True, the dataset is recorded in the catalog of the directory of dataset_file (see
+    catalog_datasets.py)
+    """
+    tasks = dataset.get('tasks')
+    with JsonlWriter(dataset_file, dataset, catalog) as writer:
+        if hasattr(tasks, 'iter_dicts'):
+            # TaskTable
+            writer.write_tasks(tasks.iter_dicts())
+        else:
+            writer.write_tasks(task for _, task in sorted(tasks.items()))
+
+
+def load_jsonl_metadata(file):
+    """ Returns the metadata (first line) of a dataset stored in the JSON Lines format
     """
+    with open(file) as infile:
+        return json.loads(infile.readline())
+
 
-    with open(dataset_file, 'w') as outfile:
-        yaml.safe_dump(dataset, outfile, default_flow_style=False)
+def iter_jsonl(file):
+    """ Yields the tasks (dicts) of a dataset stored in the JSON Lines format, reading one line at a time
+    """
+    with open(file) as infile:
+        # Skip the metadata
+        infile.readline()
+        for line in infile:
+            if line.strip():
+                yield json.loads(line)
 
 
 def store_as_csv(dataset, task_cls, path):
@@ -120,22 +544,94 @@ def store_as_csv(dataset, task_cls, path):
     to_csv(list_task_dicts, file)
 
 
-def get_dataset_name(n_tasks, n_overlapping_sets, interval_type):
-        dataset_path = 'datasets/'
-        if n_overlapping_sets > 1:
-            dataset_type = 'overlapping'
-            dataset_name = dataset_type + '_' + interval_type + '_' + str(n_tasks) + '_' + str(n_overlapping_sets)
+def get_dataset_base_name(n_tasks, n_overlapping_sets, interval_type):
+    """ Returns the name of a dataset without its id
+    """
+    if n_overlapping_sets > 1:
+        dataset_type = 'overlapping'
+        return dataset_type + '_' + interval_type + '_' + str(n_tasks) + '_' + str(n_overlapping_sets)
+    dataset_type = 'nonoverlapping'
+    return dataset_type + '_' + interval_type + '_' + str(n_tasks)
+
+
+@contextlib.contextmanager
+def _file_lock(lock_file):
+    """ Holds an exclusive lock on lock_file. Uses flock if available and an exclusively created
+    lock file otherwise
+    """
+    if fcntl is not None:
+        with open(lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return
+
+    while True:
+        try:
+            fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_file)
+
+
+def _get_dataset_base_names_ids(dataset_path):
+    """ Returns the largest id per dataset base name of the files in dataset_path, e.g.,
+    {'overlapping_random_25_5': 2} for overlapping_random_25_5_1.yaml and overlapping_random_25_5_2.yaml
+    """
+    largest_ids = dict()
+    for file_ in os.listdir(dataset_path):
+        name = file_.split('.')[0]
+        base_name, _, dataset_id = name.rpartition('_')
+        if base_name and dataset_id.isdigit() and os.path.isfile(dataset_path + file_):
+            largest_ids[base_name] = max(largest_ids.get(base_name, 0), int(dataset_id))
+    return largest_ids
+
+
+def allocate_dataset_id(base_name, dataset_path='datasets/'):
+    """ Reserves and returns the next free id of the datasets named base_name in dataset_path
+
+    The largest id per base name is kept in an index file in dataset_path, which is updated under a file lock,
+    so concurrent generators never get the same id. The index is built by listing dataset_path once; afterwards
+    allocating an id does not depend on the number of files
+
+    :param base_name: name of the dataset without id, see get_dataset_base_name
+    :param dataset_path: directory of the datasets
+    :return: id (int)
+    """
+    index_file = dataset_path + DATASET_IDS_FILE
+    with _file_lock(index_file + '.lock'):
+        if os.path.exists(index_file):
+            with open(index_file, 'r') as infile:
+                largest_ids = json.load(infile)
         else:
-            dataset_type = 'nonoverlapping'
-            dataset_name = dataset_type + '_' + interval_type + '_' + str(n_tasks)
-        largest_dataset_id = 0
-
-        for file_ in os.listdir(dataset_path):
-            if os.path.isfile(dataset_path + file_) and file_.startswith(dataset_name):
-                dataset_id = int(file_.split('_')[-1].split('.')[0])
-                if dataset_id > largest_dataset_id:
-                    largest_dataset_id = dataset_id
-        dataset_id = largest_dataset_id + 1
-
-        dataset_name = dataset_name + '_' + str(dataset_id)
-        return dataset_name
+            largest_ids = _get_dataset_base_names_ids(dataset_path)
+
+        dataset_id = largest_ids.get(base_name, 0) + 1
+        # Skip ids taken by files in any format written without allocating an id
+        while any(os.path.exists(dataset_path + base_name + '_' + str(dataset_id) + extension)
+                  for extension in DATASET_EXTENSIONS):
+            dataset_id += 1
+        largest_ids[base_name] = dataset_id
+
+        _write_atomic(index_file, 'w', lambda outfile: json.dump(largest_ids, outfile, sort_keys=True))
+
+    return dataset_id
+
+
+def get_dataset_name(n_tasks, n_overlapping_sets, interval_type, dataset_path='datasets/'):
+    """ Returns the name of a new dataset. The dataset id is reserved, see allocate_dataset_id
+    """
+    dataset_name = get_dataset_base_name(n_tasks, n_overlapping_sets, interval_type)
+    dataset_id = allocate_dataset_id(dataset_name, dataset_path)
+
+    dataset_name = dataset_name + '_' + str(dataset_id)
+    return dataset_name
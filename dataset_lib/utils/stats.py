@@ -0,0 +1,130 @@
+""" Includes a process-wide collector of generation and loading stats: counters, wall time per stage and cache
+hit rates
+"""
+
+import contextlib
+import cProfile
+import pstats
+import time
+import weakref
+
+
+class Stats:
+    """ Counters and wall time per stage
+
+    Counters and timers are cheap (a dict update per call), so they are always collected. Use reset() before
+    the code to measure and summary() after it
+    """
+
+    def __init__(self):
+        self.counters = dict()
+        self.times = dict()
+        self.calls = dict()
+        self._caches = weakref.WeakValueDictionary()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds, calls=1):
+        self.times[name] = self.times.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """ Adds the wall time of the block to the stage name
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    def register_cache(self, name, cache):
+        """ Reports the hits and misses of cache (see LRUCache.info) in the summary while cache is alive
+        """
+        self._caches[name] = cache
+
+    def get_cache_info(self):
+        return {name: cache.info() for name, cache in sorted(self._caches.items())}
+
+    def reset(self):
+        self.counters.clear()
+        self.times.clear()
+        self.calls.clear()
+        for cache in self._caches.values():
+            cache.hits = 0
+            cache.misses = 0
+
+    def to_dict(self):
+        return {'counters': dict(self.counters),
+                'times': dict(self.times),
+                'calls': dict(self.calls),
+                'caches': self.get_cache_info()}
+
+    def merge(self, stats_dict):
+        """ Adds the counters and times of a dict returned by to_dict, e.g., from a worker process
+        Caches of other processes are added as counters
+        """
+        for name, value in stats_dict['counters'].items():
+            self.count(name, value)
+        for name, seconds in stats_dict['times'].items():
+            self.add_time(name, seconds, stats_dict['calls'][name])
+        for name, info in stats_dict.get('caches', dict()).items():
+            self.count(name + '.hits', info['hits'])
+            self.count(name + '.misses', info['misses'])
+
+    def summary(self):
+        """ Returns a table with the wall time per stage, the counters and the cache hit rates
+        """
+        lines = ["%-40s %8s %12s %12s" % ('stage', 'calls', 'total (s)', 'mean (ms)')]
+        for name, seconds in sorted(self.times.items(), key=lambda item: -item[1]):
+            calls = self.calls[name]
+            lines.append("%-40s %8s %12.4f %12.4f" % (name, calls, seconds, 1000 * seconds / calls))
+
+        lines.append("")
+        lines.append("%-40s %8s" % ('counter', 'value'))
+        for name, value in sorted(self.counters.items()):
+            lines.append("%-40s %8s" % (name, value))
+
+        caches = self.get_cache_info()
+        if caches:
+            lines.append("")
+            lines.append("%-40s %8s %8s %8s" % ('cache', 'hits', 'misses', 'hit rate'))
+            for name, info in caches.items():
+                lookups = info['hits'] + info['misses']
+                hit_rate = '%.1f%%' % (100 * info['hits'] / lookups) if lookups else '-'
+                lines.append("%-40s %8s %8s %8s" % (name, info['hits'], info['misses'], hit_rate))
+
+        return '\n'.join(lines)
+
+
+stats = Stats()
+
+
+@contextlib.contextmanager
+def profile(profile_file=None):
+    """ Resets the stats, runs the block and prints the stats summary
+
+    :param profile_file: if None, the block runs without profiling. If '', only the stats summary is printed.
+    Otherwise, the block also runs under cProfile and its output is dumped to profile_file (see pstats)
+    """
+    if profile_file is None:
+        yield
+        return
+
+    stats.reset()
+    profiler = cProfile.Profile() if profile_file else None
+    start_time = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        stats.add_time('total', time.perf_counter() - start_time)
+        print(stats.summary())
+        if profiler:
+            profiler.dump_stats(profile_file)
+            pstats.Stats(profile_file).sort_stats('cumulative').print_stats(20)
+            print("cProfile output: ", profile_file)
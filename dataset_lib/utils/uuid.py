@@ -1,7 +1,11 @@
 import uuid
 
 
-def generate_uuid():
+def generate_uuid(rng=None):
     """ Returns a string containing a random uuid
+
+    :param rng: numpy Generator used to draw the uuid. If None, the uuid is drawn from the OS random source
     """
-    return str(uuid.uuid4())
+    if rng is None:
+        return str(uuid.uuid4())
+    return str(uuid.UUID(bytes=rng.bytes(16), version=4))
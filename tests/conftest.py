@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+
+def make_task_dicts(n_sets=6, n_tasks_set=4, start_time=100):
+    """ Returns task dicts of n_sets overlapping sets, with a path of three nodes per task
+    """
+    task_dicts = list()
+    for set_number in range(n_sets):
+        for j in range(n_tasks_set):
+            earliest_pickup_time = start_time + 100 * (n_tasks_set - j) + set_number
+            task_dicts.append({'task_id': 'task_%02d_%02d' % (set_number, j),
+                               'pickup_location': 'P%s' % j,
+                               'delivery_location': 'D%s' % set_number,
+                               'hard_constraints': True,
+                               'earliest_pickup_time': earliest_pickup_time,
+                               'latest_pickup_time': earliest_pickup_time + 30 + j,
+                               'plan': {'path': ['P%s' % j, 'N%s' % (j + set_number), 'D%s' % set_number],
+                                        'estimated_duration': 10 + j},
+                               'set_number': set_number})
+    return task_dicts
+
+
+def get_grid_map(width=8, seed=0):
+    """ Returns a width x width grid with random edge durations, so that shortest paths are unique
+    """
+    rng = np.random.default_rng(seed)
+    edges = list()
+    for x in range(width):
+        for y in range(width):
+            if x + 1 < width:
+                edges.append(['N%s_%s' % (x, y), 'N%s_%s' % (x + 1, y), float(rng.uniform(1, 10)),
+                              float(rng.uniform(0, 1))])
+            if y + 1 < width:
+                edges.append(['N%s_%s' % (x, y), 'N%s_%s' % (x, y + 1), float(rng.uniform(1, 10)),
+                              float(rng.uniform(0, 1))])
+    goals = {'left': ['N%s_%s' % (x, y) for x in range(width // 2) for y in range(0, width, 2)],
+             'right': ['N%s_%s' % (x, y) for x in range(width // 2, width) for y in range(1, width, 2)]}
+    return {'goals': goals, 'edges': edges}
+
+
+@pytest.fixture
+def grid_map():
+    """ Map dict of an 8 x 8 grid with the map sections left and right
+    """
+    return get_grid_map()
+
+
+@pytest.fixture
+def dataset():
+    """ Dataset dict with 6 sets of 4 tasks in the map sections a, b and c
+    """
+    return {'dataset_name': 'test', 'dataset_type': 'overlapping', 'start_time': 100,
+            'pickup_time_interval': {'interval_type': 'random', 'lower_bound': 30, 'upper_bound': 60},
+            'time_window_interval': {'interval_type': 'random', 'lower_bound': 30, 'upper_bound': 120},
+            'map_sections': ['a', 'b', 'c'],
+            'tasks': {task['task_id']: task for task in make_task_dicts()}}
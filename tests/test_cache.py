@@ -0,0 +1,48 @@
+from dataset_lib.utils.cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(3)
+    for key in 'abc':
+        cache.put(key, key.upper())
+    # a becomes the most recently used entry, so b is evicted
+    assert cache.get('a') == 'A'
+    cache.put('d', 'D')
+    assert 'b' not in cache
+    assert [key for key, _ in cache.items()] == ['c', 'a', 'd']
+
+    # Putting an existing key also marks it as the most recently used entry
+    cache.put('c', 'C2')
+    cache.put('e', 'E')
+    assert cache.items() == [('d', 'D'), ('c', 'C2'), ('e', 'E')]
+    assert len(cache) == 3
+
+
+def test_unbounded():
+    cache = LRUCache()
+    cache.update((i, i) for i in range(1000))
+    assert len(cache) == 1000
+
+
+def test_items_update():
+    cache = LRUCache(3)
+    cache.update([('a', 1), ('b', 2)])
+    other_cache = LRUCache(2)
+    other_cache.update(cache.items())
+    assert other_cache.items() == [('a', 1), ('b', 2)]
+    # update keeps the order of items and the maxsize of the cache
+    other_cache.update([('c', 3)])
+    assert other_cache.items() == [('b', 2), ('c', 3)]
+
+
+def test_hits_and_misses():
+    cache = LRUCache(2)
+    assert cache.get('a') is None
+    assert cache.get('a', 0) == 0
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    assert 'a' in cache
+    assert cache.info() == {'hits': 1, 'misses': 2, 'size': 1, 'maxsize': 2}
+
+    cache.clear()
+    assert cache.info() == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 2}
@@ -0,0 +1,18 @@
+import os
+
+from dataset_lib.convert_datasets import convert_datasets
+from dataset_lib.load_dataset import load_dataset_file
+from dataset_lib.utils.datasets import store_as_yaml
+
+
+def test_convert_directory_with_node_table(dataset, tmp_path):
+    datasets_dir = str(tmp_path) + '/'
+    store_as_yaml(dataset, datasets_dir + 'dataset_1.yaml', interned_paths=True, nodes_file='nodes.yaml')
+    store_as_yaml(dataset, datasets_dir + 'dataset_2.yaml')
+
+    dataset_files = convert_datasets(datasets_dir=datasets_dir)
+
+    assert dataset_files == [datasets_dir + 'dataset_1.npz', datasets_dir + 'dataset_2.npz']
+    assert not os.path.exists(datasets_dir + 'nodes.npz')
+    for dataset_file in dataset_files:
+        assert load_dataset_file(dataset_file, 'task').to_dict() == dataset
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from dataset_lib.config.creators import CreatorRegistry, DeliverySampler, creator_registry
+from dataset_lib.config.planners import GraphPlanner, MapGraph
+
+MAP_NAME = 'test_map'
+
+
+@pytest.fixture
+def registry():
+    map_graph = MapGraph.from_dict({'goals': {'a': ['A', 'B', 'C']},
+                                    'edges': [['A', 'B', 2.0, 0.1], ['B', 'C', 3.0, 0.2]]})
+    # PoseCreator takes the planner from the process-wide registry
+    creator_registry.register_planner(MAP_NAME, GraphPlanner(map_graph))
+    yield creator_registry
+    creator_registry.release(MAP_NAME)
+
+
+def test_get_pose_creator_same_config(registry):
+    pose_creator = registry.get_pose_creator(MAP_NAME, seed=1, use_duration_matrix=False)
+    assert registry.get_pose_creator(MAP_NAME) is pose_creator
+    assert registry.get_pose_creator(MAP_NAME, seed=1, cache_size=100000) is pose_creator
+
+
+@pytest.mark.parametrize('kwargs', [{'seed': 2}, {'use_duration_matrix': True}, {'cache_size': 10},
+                                    {'planner_backend': 'graph'}])
+def test_get_pose_creator_different_config(registry, kwargs):
+    registry.get_pose_creator(MAP_NAME, seed=1, use_duration_matrix=False)
+    with pytest.raises(ValueError):
+        registry.get_pose_creator(MAP_NAME, **kwargs)
+
+
+def test_get_pose_creator_after_release(registry):
+    planner = registry.get_planner(MAP_NAME)
+    pose_creator = registry.get_pose_creator(MAP_NAME, seed=1, use_duration_matrix=False)
+    registry.register_planner(MAP_NAME, planner)
+    assert registry.get_pose_creator(MAP_NAME, seed=2, use_duration_matrix=False) is not pose_creator
+
+
+def test_get_planner_registered_planner(registry):
+    planner = registry.get_planner(MAP_NAME)
+    assert registry.get_planner(MAP_NAME) is planner
+    with pytest.raises(ValueError):
+        registry.get_planner(MAP_NAME, 'graph')
+
+
+def test_get_planner_backend(tmp_path):
+    map_file = str(tmp_path / 'test_map.yaml')
+    with open(map_file, 'w') as outfile:
+        outfile.write("goals:\n  a: [A, B]\nedges:\n- [A, B, 2.0, 0.1]\n")
+    registry = CreatorRegistry()
+    planner = registry.get_planner(map_file)
+    assert isinstance(planner, GraphPlanner)
+    assert registry.get_planner(map_file, 'graph') is planner
+    with pytest.raises(ValueError):
+        registry.get_planner(map_file, 'planner')
+
+
+def get_delivery_sampler():
+    """ Returns a DeliverySampler of the poses P0, ..., P9, where the duration from Pi to Pj is 10 * |i - j|
+    """
+    def get_estimated_duration(pickup_pose, delivery_pose):
+        return 10 * abs(int(pickup_pose[1:]) - int(delivery_pose[1:]))
+
+    return DeliverySampler(get_estimated_duration), tuple('P%s' % i for i in range(10))
+
+
+def test_delivery_sampler_within_duration_range():
+    delivery_sampler, poses = get_delivery_sampler()
+    rng = np.random.default_rng(0)
+    delivery_poses = {delivery_sampler.sample('a', poses, 'P4', [20, 30], rng) for _ in range(200)}
+    # Durations 20 and 30 from P4, both bounds included
+    assert delivery_poses == {'P1', 'P2', 'P6', 'P7'}
+
+
+def test_delivery_sampler_empty_duration_range():
+    delivery_sampler, poses = get_delivery_sampler()
+    rng = np.random.default_rng(0)
+    with pytest.raises(ValueError):
+        delivery_sampler.sample('a', poses, 'P4', [11, 19], rng)
+    with pytest.raises(ValueError):
+        delivery_sampler.sample('a', poses, 'P0', [100, 200], rng)
+    # The pickup pose is not a delivery pose
+    with pytest.raises(ValueError):
+        delivery_sampler.sample('a', poses, 'P4', [0, 5], rng)
@@ -0,0 +1,35 @@
+from dataset_lib.config.dataset_view import DatasetView
+from dataset_lib.split_datasets import get_task_scalability_dataset
+
+
+def test_set_tasks_dict(dataset):
+    view = DatasetView.from_dict(dataset, 'task')
+    assert len(view.set_number) == 24
+
+    view['tasks'] = get_task_scalability_dataset(2, view['tasks'])
+
+    assert view.n_tasks == 12
+    assert len(view.set_number) == 12
+    assert len(view.earliest_pickup_time) == 12
+    assert all(hasattr(task, 'task_id') for task in view.tasks)
+    assert [task.task_id for task in view] == sorted(view.to_dict()['tasks'])
+    assert len(view.table) == 12
+
+
+def test_set_tasks_objects(dataset):
+    view = DatasetView.from_dict(dataset, 'task')
+    tasks = [task for task in view.tasks if task.set_number == 0]
+    for task in tasks:
+        task.earliest_pickup_time += 10
+
+    view['tasks'] = tasks
+
+    assert view.set_number.tolist() == [0] * 4
+    assert view.to_dict()['tasks'] == {task.task_id: task.to_dict() for task in tasks}
+
+
+def test_changed_task_objects_in_to_dict(dataset):
+    view = DatasetView.from_dict(dataset, 'task')
+    task = view.tasks[0]
+    task.latest_pickup_time += 5
+    assert view.to_dict()['tasks'][task.task_id]['latest_pickup_time'] == task.latest_pickup_time
@@ -0,0 +1,155 @@
+import gc
+import os
+
+import numpy as np
+import pytest
+from dataset_lib.load_dataset import load_dataset_file, load_yaml_dataset
+from dataset_lib.utils.catalog import CATALOG_FILE
+from dataset_lib.utils.datasets import JsonlWriter, allocate_dataset_id, columns_to_dataset, dataset_to_columns, \
+    iter_jsonl, load_jsonl_metadata, load_npz, load_yaml_cached, store_as_jsonl, store_as_npz, store_as_yaml
+from dataset_lib.utils.stats import stats
+
+
+def test_catalog_is_opt_in(dataset, tmp_path):
+    store_as_yaml(dataset, str(tmp_path / 'dataset_1.yaml'))
+    store_as_npz(dataset, str(tmp_path / 'dataset_1.npz'))
+    store_as_jsonl(dataset, str(tmp_path / 'dataset_1.jsonl'))
+    assert not os.path.exists(tmp_path / CATALOG_FILE)
+
+    store_as_yaml(dataset, str(tmp_path / 'dataset_2.yaml'), catalog=True)
+    assert os.path.exists(tmp_path / CATALOG_FILE)
+
+
+def test_allocate_dataset_id_skips_files_of_any_format(tmp_path):
+    dataset_path = str(tmp_path) + '/'
+    assert allocate_dataset_id('overlapping_random_25_5', dataset_path) == 1
+    for dataset_id, extension in [(2, '.yaml'), (3, '.npz'), (4, '.jsonl')]:
+        open(dataset_path + 'overlapping_random_25_5_%s%s' % (dataset_id, extension), 'w').close()
+    assert allocate_dataset_id('overlapping_random_25_5', dataset_path) == 5
+    assert allocate_dataset_id('overlapping_random_25_5', dataset_path) == 6
+
+
+def get_temporary_files(directory):
+    return [file_ for file_ in os.listdir(directory) if file_.startswith('.tmp_')]
+
+
+def test_jsonl_writer_without_with(dataset, tmp_path):
+    dataset_file = str(tmp_path / 'dataset.jsonl')
+    writer = JsonlWriter(dataset_file, dataset)
+    assert not get_temporary_files(tmp_path)
+    writer.write_tasks(task for _, task in sorted(dataset['tasks'].items()))
+    writer.close()
+    writer.close()
+    assert not get_temporary_files(tmp_path)
+    assert load_jsonl_metadata(dataset_file) == {key: value for key, value in dataset.items() if key != 'tasks'}
+    assert len(list(iter_jsonl(dataset_file))) == len(dataset['tasks'])
+
+
+def test_jsonl_writer_not_closed(dataset, tmp_path):
+    writer = JsonlWriter(str(tmp_path / 'dataset.jsonl'), dataset)
+    writer.write_task(next(iter(dataset['tasks'].values())))
+    assert len(get_temporary_files(tmp_path)) == 1
+    del writer
+    gc.collect()
+    assert not os.listdir(tmp_path)
+
+
+def test_jsonl_writer_error(dataset, tmp_path):
+    with pytest.raises(KeyError):
+        with JsonlWriter(str(tmp_path / 'dataset.jsonl'), dataset) as writer:
+            writer.write_task(next(iter(dataset['tasks'].values())))
+            raise KeyError()
+    assert not os.listdir(tmp_path)
+
+
+def get_metadata(dataset):
+    return {key: value for key, value in dataset.items() if key != 'tasks'}
+
+
+@pytest.mark.parametrize('file_name, store_kwargs', [('dataset.yaml', {}),
+                                                     ('dataset.yaml', {'interned_paths': True}),
+                                                     ('dataset.yaml', {'interned_paths': True,
+                                                                       'nodes_file': 'nodes.yaml'}),
+                                                     ('dataset.npz', {}),
+                                                     ('dataset.jsonl', {})])
+def test_round_trip(dataset, tmp_path, file_name, store_kwargs):
+    dataset_file = str(tmp_path / file_name)
+    store = {'.yaml': store_as_yaml, '.npz': store_as_npz, '.jsonl': store_as_jsonl}[os.path.splitext(file_name)[1]]
+    store(dataset, dataset_file, **store_kwargs)
+
+    view = load_dataset_file(dataset_file, 'task')
+    assert view.to_dict() == dataset
+    assert view.metadata == get_metadata(dataset)
+    assert view.earliest_pickup_time.tolist() == [task['earliest_pickup_time']
+                                                  for _, task in sorted(dataset['tasks'].items())]
+
+
+def test_load_npz_memory_maps_arrays(dataset, tmp_path):
+    dataset_file = str(tmp_path / 'dataset.npz')
+    store_as_npz(dataset, dataset_file)
+    columns = load_npz(dataset_file)
+    expected = dataset_to_columns(dataset)
+
+    assert set(columns) == set(expected)
+    for name, array in expected.items():
+        np.testing.assert_array_equal(columns[name], array)
+    assert isinstance(columns['earliest_pickup_time'], np.memmap)
+    assert isinstance(columns['task_id'], np.memmap)
+    # 0-d array, read with np.load
+    assert not isinstance(columns['metadata'], np.memmap)
+    assert not any(isinstance(array, np.memmap) for array in load_npz(dataset_file, mmap_mode=None).values())
+
+
+def test_load_npz_compressed(dataset, tmp_path):
+    dataset_file = str(tmp_path / 'dataset.npz')
+    columns = dataset_to_columns(dataset)
+    np.savez_compressed(dataset_file, **columns)
+
+    loaded = load_npz(dataset_file)
+    for name, array in columns.items():
+        assert not isinstance(loaded[name], np.memmap)
+        np.testing.assert_array_equal(loaded[name], array)
+    assert columns_to_dataset(loaded) == dataset
+
+
+def test_load_npz_empty_member(tmp_path):
+    dataset_file = str(tmp_path / 'arrays.npz')
+    np.savez(dataset_file, empty=np.zeros(0, dtype=np.int64), empty_2d=np.zeros((3, 0)),
+             values=np.arange(5, dtype=np.int64), fortran=np.asfortranarray(np.arange(6).reshape(2, 3)))
+
+    loaded = load_npz(dataset_file)
+    assert not isinstance(loaded['empty'], np.memmap) and loaded['empty'].shape == (0,)
+    assert not isinstance(loaded['empty_2d'], np.memmap) and loaded['empty_2d'].shape == (3, 0)
+    assert isinstance(loaded['values'], np.memmap)
+    np.testing.assert_array_equal(loaded['values'], np.arange(5))
+    np.testing.assert_array_equal(loaded['fortran'], np.arange(6).reshape(2, 3))
+
+
+def set_mtime(file, mtime_ns):
+    os.utime(file, ns=(mtime_ns, mtime_ns))
+
+
+def test_load_yaml_cached_reloads_changed_file(dataset, tmp_path):
+    dataset_file = str(tmp_path / 'test.yaml')
+    store_as_yaml(dataset, dataset_file)
+    mtime_ns = os.stat(dataset_file).st_mtime_ns
+    datasets_dir = str(tmp_path) + '/'
+    stats.reset()
+    assert load_yaml_dataset('test', 'task', cache=True, datasets_dir=datasets_dir)['tasks'][0].earliest_pickup_time \
+        == dataset['tasks']['task_00_00']['earliest_pickup_time']
+    assert load_yaml_cached(dataset_file) == load_yaml_cached(dataset_file)
+    assert stats.counters == {'yaml_cache.misses': 1, 'yaml_cache.hits': 2}
+
+    # Same content and a new modification time: the entry is still valid (same hash)
+    set_mtime(dataset_file, mtime_ns + 10**9)
+    load_yaml_cached(dataset_file)
+    assert stats.counters == {'yaml_cache.misses': 1, 'yaml_cache.hits': 3}
+
+    # New content
+    dataset['tasks']['task_00_00']['earliest_pickup_time'] = 1000
+    store_as_yaml(dataset, dataset_file)
+    set_mtime(dataset_file, mtime_ns + 2 * 10**9)
+    assert load_yaml_cached(dataset_file)['tasks']['task_00_00']['earliest_pickup_time'] == 1000
+    assert load_yaml_dataset('test', 'task', cache=True, datasets_dir=datasets_dir)['tasks'][0].earliest_pickup_time \
+        == 1000
+    assert stats.counters == {'yaml_cache.misses': 2, 'yaml_cache.hits': 4}
@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+from dataset_lib.config.creators import PoseCreator, creator_registry
+from dataset_lib.config.duration_matrix import DurationMatrix, FILE_NAMES, get_duration_matrix_path, \
+    get_goal_poses, get_map_hash, load_duration_matrix
+from dataset_lib.config.planners import GraphPlanner, MapGraph
+from dataset_lib.utils.stats import stats
+
+MAP_NAME = 'test_grid_map'
+
+
+@pytest.fixture
+def planner(grid_map):
+    planner = GraphPlanner(MapGraph.from_dict(grid_map))
+    creator_registry.register_planner(MAP_NAME, planner)
+    yield planner
+    creator_registry.release(MAP_NAME)
+
+
+def save_duration_matrix(planner, directory):
+    path = get_duration_matrix_path(MAP_NAME, get_map_hash(planner.map_graph), str(directory))
+    duration_matrix = DurationMatrix.compute(planner)
+    duration_matrix.save(path)
+    return path, duration_matrix
+
+
+def test_save_load_round_trip(planner, tmp_path):
+    path, duration_matrix = save_duration_matrix(planner, tmp_path)
+    # The temporary directory was renamed to path
+    assert os.listdir(str(tmp_path)) == [os.path.basename(path)]
+    assert sorted(os.listdir(path)) == sorted(file_name + '.npy' for file_name in FILE_NAMES)
+
+    loaded_matrix = load_duration_matrix(MAP_NAME, planner.map_graph, str(tmp_path))
+    for file_name in FILE_NAMES:
+        array = getattr(loaded_matrix, file_name)
+        assert isinstance(array, np.memmap)
+        np.testing.assert_array_equal(array, getattr(duration_matrix, file_name))
+
+    pose_creator = PoseCreator(MAP_NAME, use_duration_matrix=True, duration_matrix_dir=str(tmp_path))
+    assert pose_creator.duration_matrix is not None
+    stats.reset()
+    goals = get_goal_poses(planner.map_graph)
+    for pickup_pose in goals:
+        for delivery_pose in goals:
+            path = planner.get_path(pickup_pose, delivery_pose)
+            mean, variance = planner.get_estimated_duration(path)
+            assert pose_creator.get_path(pickup_pose, delivery_pose) == path
+            assert pose_creator.get_estimated_duration(pickup_pose, delivery_pose) == round(mean + 2*(variance**0.5))
+    # Nothing was planned by the pose creator
+    assert stats.counters['duration_matrix.hits'] == 2 * len(goals)**2
+    assert 'planner.calls' not in stats.counters
+
+
+def test_changed_map_invalidates_matrix(planner, grid_map, tmp_path):
+    save_duration_matrix(planner, tmp_path)
+    grid_map['edges'][0][2] += 1.0
+    changed_planner = GraphPlanner(MapGraph.from_dict(grid_map))
+    assert get_map_hash(changed_planner.map_graph) != get_map_hash(planner.map_graph)
+    assert load_duration_matrix(MAP_NAME, changed_planner.map_graph, str(tmp_path)) is None
+
+    creator_registry.register_planner(MAP_NAME, changed_planner)
+    pose_creator = PoseCreator(MAP_NAME, use_duration_matrix=True, duration_matrix_dir=str(tmp_path))
+    assert pose_creator.duration_matrix is None
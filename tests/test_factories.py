@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from dataset_lib.config.creators import DatasetCreator, TaskCreator, creator_registry
+from dataset_lib.config.factories import DatasetMeta, Interval, add_constraints, get_tasks_set, \
+    order_by_estimated_durations
+from dataset_lib.config.planners import GraphPlanner, MapGraph
+
+MAP_NAME = 'test_grid_map'
+
+
+@pytest.fixture
+def planner(grid_map):
+    planner = GraphPlanner(MapGraph.from_dict(grid_map))
+    # Registered planners are sent to the worker processes, see OverlappingTW.iter_tasks_sets_parallel
+    creator_registry.register_planner(MAP_NAME, planner)
+    creator_registry.get_pose_creator(MAP_NAME, use_duration_matrix=False)
+    yield planner
+    creator_registry.release(MAP_NAME)
+
+
+def get_dataset_meta(dataset_type, interval_type='random'):
+    return DatasetMeta('test', dataset_type, 100, Interval(interval_type, 30, 60), Interval(interval_type, 30, 120),
+                       ['left', 'right'])
+
+
+def create_dataset(dataset_type, seed, **kwargs):
+    dataset_creator = DatasetCreator('task', MAP_NAME, get_dataset_meta(dataset_type), seed)
+    if dataset_type == 'overlapping':
+        dataset, _ = dataset_creator.create(n_tasks=12, n_overlapping_sets=4, duration_range=[5, 60], **kwargs)
+    else:
+        dataset, _ = dataset_creator.create(n_tasks=6, duration_range=[5, 60], **kwargs)
+    return dataset
+
+
+@pytest.mark.parametrize('mp_context', [None, 'spawn'])
+def test_parallel_creation_equals_serial(planner, mp_context):
+    serial = create_dataset('overlapping', 7, workers=1)
+    parallel = create_dataset('overlapping', 7, workers=2, mp_context=mp_context)
+    assert len(serial['tasks']) == 12
+    assert parallel == serial
+
+
+def add_constraints_scalar(tasks, pickup_time_interval, time_window_interval, dataset_start_time, pose_creator,
+                           rng):
+    """ Returns the (earliest, latest) pickup times of the tasks computed one task at a time, drawing the
+    intervals in the order pickup_0, time_window_1, pickup_1, ..., pickup_n-1
+    """
+    pickup_times = list()
+    for i, task in enumerate(tasks):
+        if i == 0:
+            earliest_pickup_time = dataset_start_time
+        else:
+            previous_task = tasks[i - 1]
+            travel_time = pose_creator.get_estimated_duration(previous_task.delivery_location, task.pickup_location)
+            earliest_pickup_time = (pickup_times[-1][1] + previous_task.plan.estimated_duration + travel_time +
+                                    time_window_interval(rng=rng))
+        pickup_times.append((earliest_pickup_time, earliest_pickup_time + pickup_time_interval(rng=rng)))
+    return pickup_times
+
+
+@pytest.mark.parametrize('pickup_type, time_window_type', [('random', 'random'), ('tight', 'random'),
+                                                            ('random', 'loose'), ('loose', 'tight')])
+def test_add_constraints_equals_scalar_recurrence(planner, pickup_type, time_window_type):
+    pose_creator = creator_registry.get_pose_creator(MAP_NAME)
+    tasks = get_tasks_set(TaskCreator('task'), pose_creator, [5, 60], 10, ['left', 'right'],
+                          rng=np.random.default_rng(3))
+    tasks = order_by_estimated_durations(tasks)
+    pickup_time_interval = Interval(pickup_type, 30, 60)
+    time_window_interval = Interval(time_window_type, 30, 120)
+
+    expected = add_constraints_scalar(tasks, pickup_time_interval, time_window_interval, 100, pose_creator,
+                                      np.random.default_rng(5))
+    tasks = add_constraints(tasks, pickup_time_interval, time_window_interval, 100, pose_creator,
+                            rng=np.random.default_rng(5))
+
+    assert [(task.earliest_pickup_time, task.latest_pickup_time) for task in tasks] == expected
+
+
+def get_task_fields(dataset):
+    return [(task['task_id'], task['pickup_location'], task['delivery_location'], task['earliest_pickup_time'],
+             task['latest_pickup_time']) for _, task in sorted(dataset['tasks'].items())]
+
+
+@pytest.mark.parametrize('dataset_type', ['overlapping', 'nonoverlapping'])
+def test_same_seed_same_dataset(planner, dataset_type):
+    dataset = create_dataset(dataset_type, 11)
+    assert get_task_fields(create_dataset(dataset_type, 11)) == get_task_fields(dataset)
+    other_dataset = create_dataset(dataset_type, 12)
+    # Not only the task ids change with the seed
+    for field in range(5):
+        assert [fields[field] for fields in get_task_fields(other_dataset)] != \
+               [fields[field] for fields in get_task_fields(dataset)]
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from dataset_lib.config.duration_matrix import DurationMatrix
+from dataset_lib.config.planners import GraphPlanner, MapGraph
+
+
+def get_planners(map_dict):
+    floyd_warshall = GraphPlanner(MapGraph.from_dict(map_dict))
+    dijkstra = GraphPlanner(MapGraph.from_dict(map_dict))
+    dijkstra._use_floyd_warshall = False
+    assert floyd_warshall._use_floyd_warshall
+    return floyd_warshall, dijkstra
+
+
+class PairPlanner:
+    """ Planner without get_shortest_paths, so that DurationMatrix.compute plans each pair of poses
+    """
+
+    def __init__(self, planner):
+        self.map_graph = planner.map_graph
+        self.get_path = planner.get_path
+        self.get_estimated_duration = planner.get_estimated_duration
+
+
+def test_floyd_warshall_and_dijkstra_agree(grid_map):
+    floyd_warshall, dijkstra = get_planners(grid_map)
+    nodes = floyd_warshall.map_graph.nodes()
+
+    fw_means, fw_variances, fw_predecessors = floyd_warshall.get_shortest_paths(nodes)
+    means, variances, predecessors = dijkstra.get_shortest_paths(nodes)
+
+    np.testing.assert_allclose(fw_means, means)
+    np.testing.assert_allclose(fw_variances, variances)
+    np.testing.assert_array_equal(fw_predecessors, predecessors)
+
+    for source in nodes[::5]:
+        for target in nodes[::3]:
+            path = floyd_warshall.get_path(source, target)
+            assert path == dijkstra.get_path(source, target)
+            assert path[0] == source and path[-1] == target
+            mean, variance = floyd_warshall.get_estimated_duration(path)
+            i, j = floyd_warshall.map_graph.node_index[source], floyd_warshall.map_graph.node_index[target]
+            assert mean == pytest.approx(means[i, j])
+            assert variance == pytest.approx(variances[i, j])
+
+
+def test_duration_matrix_backends_agree(grid_map):
+    floyd_warshall, dijkstra = get_planners(grid_map)
+    matrices = [DurationMatrix.compute(floyd_warshall), DurationMatrix.compute(dijkstra),
+                DurationMatrix.compute(PairPlanner(dijkstra))]
+    goals = matrices[0].goals.tolist()
+
+    for matrix in matrices[1:]:
+        assert matrix.goals.tolist() == goals
+        np.testing.assert_array_equal(matrix.durations, matrices[0].durations)
+        for pickup_pose in goals:
+            for delivery_pose in goals:
+                assert matrix.get_path(pickup_pose, delivery_pose) == \
+                    matrices[0].get_path(pickup_pose, delivery_pose)
+
+
+@pytest.mark.parametrize('use_floyd_warshall', [True, False])
+def test_no_path(use_floyd_warshall):
+    map_dict = {'goals': {'a': ['A', 'B'], 'c': ['C', 'D']},
+                'edges': [['A', 'B', 1.0, 0.1], ['C', 'D', 1.0, 0.1], ['B', 'E', 1.0, 0.1]],
+                'directed': True}
+    planner = GraphPlanner(MapGraph.from_dict(map_dict))
+    planner._use_floyd_warshall = use_floyd_warshall
+
+    assert planner.get_path('A', 'E') == ['A', 'B', 'E']
+    with pytest.raises(ValueError):
+        planner.get_path('A', 'C')
+    with pytest.raises(ValueError):
+        # The edges are directed
+        planner.get_path('B', 'A')
+
+
+@pytest.mark.parametrize('use_floyd_warshall', [True, False])
+def test_duration_matrix_no_path(use_floyd_warshall):
+    map_dict = {'goals': {'a': ['A', 'B'], 'c': ['C', 'D']},
+                'edges': [['A', 'B', 1.0, 0.1], ['C', 'D', 1.0, 0.1]]}
+    planner = GraphPlanner(MapGraph.from_dict(map_dict))
+    planner._use_floyd_warshall = use_floyd_warshall
+
+    with pytest.raises(ValueError):
+        DurationMatrix.compute(planner)
+    with pytest.raises(ValueError):
+        DurationMatrix.compute(PairPlanner(planner))
@@ -0,0 +1,20 @@
+import argparse
+
+import pytest
+from dataset_lib.sweep_datasets import parse_bounds, parse_range
+
+
+def test_parse_range():
+    assert parse_range('5:25:5') == [5, 10, 15, 20, 25]
+    assert parse_range('1:3') == [1, 2, 3]
+    assert parse_range('5,10,25') == [5, 10, 25]
+
+
+def test_parse_bounds():
+    assert parse_bounds('30,120') == [30, 120]
+
+
+@pytest.mark.parametrize('bounds_str', ['30:120', '30', '30,60,120', '120,30', 'a,b'])
+def test_parse_bounds_invalid(bounds_str):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_bounds(bounds_str)
@@ -0,0 +1,53 @@
+import numpy as np
+from dataset_lib.config.task_table import TaskTable
+
+
+def get_table(dataset):
+    return TaskTable.from_dicts(task for _, task in sorted(dataset['tasks'].items()))
+
+
+def test_from_dicts_round_trip(dataset):
+    assert get_table(dataset).to_dict() == dataset['tasks']
+
+
+def test_take_indices(dataset):
+    table = get_table(dataset)
+    task_dicts = list(table.iter_dicts())
+    indices = [5, 0, 23, 5]
+
+    taken = table.take(indices)
+
+    assert len(taken) == 4
+    assert list(taken.iter_dicts()) == [task_dicts[i] for i in indices]
+    assert taken.nodes is table.nodes
+    assert [taken.get_path(i) for i in range(4)] == [task_dicts[i]['plan']['path'] for i in indices]
+
+
+def test_take_mask(dataset):
+    table = get_table(dataset)
+    mask = table.set_number == 2
+
+    taken = table.take(mask)
+
+    assert list(taken.iter_dicts()) == [task for task in table.iter_dicts() if task['set_number'] == 2]
+
+
+def test_take_empty(dataset):
+    taken = get_table(dataset).take(np.zeros(0, dtype=np.int64))
+    assert len(taken) == 0
+    assert taken.to_dict() == dict()
+
+
+def test_replace(dataset):
+    table = get_table(dataset)
+    earliest_pickup_times = table.earliest_pickup_time + 10
+
+    replaced = table.replace(earliest_pickup_time=earliest_pickup_times)
+
+    assert replaced.earliest_pickup_time is earliest_pickup_times
+    assert replaced.latest_pickup_time is table.latest_pickup_time
+    assert replaced.path_nodes is table.path_nodes
+    # The original table does not change
+    assert table.to_dict() == dataset['tasks']
+    for task_id, task in replaced.to_dict().items():
+        assert task['earliest_pickup_time'] == dataset['tasks'][task_id]['earliest_pickup_time'] + 10
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+from dataset_lib.config.dataset_view import DatasetView
+from dataset_lib.load_dataset import load_dataset_file
+from dataset_lib.transform_datasets import parse_transform, transform_dataset, transform_datasets
+from dataset_lib.utils.datasets import store_as_npz, store_as_yaml
+
+
+def transform(dataset, *transforms):
+    return transform_dataset(DatasetView.from_dict(dataset, 'task'),
+                             [parse_transform(transform_str) for transform_str in transforms])
+
+
+def get_set_numbers(dataset):
+    return np.unique(dataset['tasks'].set_number).tolist()
+
+
+def test_filter_sections(dataset):
+    assert get_set_numbers(transform(dataset, 'sections:b')) == [1, 4]
+    assert get_set_numbers(transform(dataset, 'sections:b,c')) == [1, 2, 4, 5]
+
+
+def test_chained_filter_sections(dataset):
+    transformed = transform(dataset, 'sections:b,c', 'sections:b')
+    assert get_set_numbers(transformed) == [1, 4]
+    assert transformed['map_sections'] == dataset['map_sections']
+
+
+def test_filter_sections_of_transformed_dataset(dataset):
+    transformed = transform(dataset, 'sections:b,c')
+    transformed['tasks'] = transformed['tasks'].to_dict()
+    assert get_set_numbers(transform(transformed, 'sections:b')) == [1, 4]
+
+
+def test_shift_and_truncate(dataset):
+    transformed = transform(dataset, 'shift:300', 'truncate:2')
+    tasks = transformed['tasks'].to_dict()
+    assert len(tasks) == 12
+    for task_id, task in tasks.items():
+        original = dataset['tasks'][task_id]
+        assert task['earliest_pickup_time'] == original['earliest_pickup_time'] + 300
+        assert task['latest_pickup_time'] == original['latest_pickup_time'] + 300
+        assert task['plan'] == original['plan']
+    # The two tasks with the lowest earliest pickup time of each set
+    assert sorted(tasks) == sorted('task_%02d_%02d' % (set_number, j) for set_number in range(6) for j in (2, 3))
+
+
+def test_scale_windows(dataset):
+    tasks = transform(dataset, 'scale:2')['tasks'].to_dict()
+    for task_id, task in tasks.items():
+        original = dataset['tasks'][task_id]
+        assert task['earliest_pickup_time'] == original['earliest_pickup_time']
+        assert task['latest_pickup_time'] - task['earliest_pickup_time'] == \
+            2 * (original['latest_pickup_time'] - original['earliest_pickup_time'])
+
+
+def test_transform_directory_with_node_table(dataset, tmp_path):
+    input_dir = str(tmp_path / 'input')
+    os.makedirs(input_dir)
+    store_as_yaml(dataset, os.path.join(input_dir, 'dataset_1.yaml'), interned_paths=True, nodes_file='nodes.yaml')
+    store_as_npz(dataset, os.path.join(input_dir, 'dataset_2.npz'))
+
+    output_files = transform_datasets(input_dir, str(tmp_path / 'output'), [parse_transform('sets:1')], workers=2)
+
+    assert [os.path.basename(output_file) for output_file in output_files] == ['dataset_1.yaml', 'dataset_2.npz']
+    for output_file in output_files:
+        assert get_set_numbers(transform(load_dataset_file(output_file, 'task').to_dict())) == [1]
+
+
+def test_load_node_table(dataset, tmp_path):
+    store_as_yaml(dataset, str(tmp_path / 'dataset.yaml'), interned_paths=True, nodes_file='nodes.yaml')
+    with pytest.raises(ValueError):
+        load_dataset_file(str(tmp_path / 'nodes.yaml'), 'task')